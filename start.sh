@@ -6,7 +6,7 @@ echo "🚀 Starting TBNT Project..."
 lsof -ti:8000 | xargs kill -9 2>/dev/null
 lsof -ti:5173 | xargs kill -9 2>/dev/null
 
-# Start Backend
+# Start Backend (development, auto-reload). Production: cd tbnt-api && python -m app.commands.serve
 echo "📂 Starting Backend..."
 cd tbnt-api
 # Check if conda is installed and try to run with tbnt_env
@@ -0,0 +1,61 @@
+import hashlib
+from typing import Any, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.models.user import User
+
+# Clients may keep list responses but must revalidate them on every poll
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Build a weak ETag from a resource name, the user and cheap version
+    values (counts, max ids, max updated_at) describing the list contents.
+    """
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def profiles_version(db: Session) -> Any:
+    """
+    Version of all user profiles, for lists that embed sender/friend info.
+    """
+    return db.query(func.max(User.updated_at)).scalar()
+
+
+def conditional(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    Answer 304 if the client already has this version, otherwise attach the
+    ETag to the response that the endpoint is about to build.
+    """
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Authorization"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if "*" in tags or etag.removeprefix("W/") in tags:
+            return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+class APIGZipMiddleware(GZipMiddleware):
+    """
+    GZip for API responses only. Static files are already compressed
+    images (or have pre-compressed copies) and support Range requests.
+    """
+
+    def __init__(self, app: ASGIApp, prefix: str, **kwargs) -> None:
+        super().__init__(app, **kwargs)
+        self.prefix = prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
@@ -37,3 +37,10 @@ def get_current_active_user(
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
+
+def get_current_admin_user(
+    current_user: User = Depends(get_current_active_user),
+) -> User:
+    if current_user.role_level is None or current_user.role_level > settings.ADMIN_ROLE_LEVEL:
+        raise HTTPException(status_code=403, detail="Not enough privileges")
+    return current_user
@@ -0,0 +1,59 @@
+from datetime import date
+from typing import Any, List, Literal, Optional
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+
+from app.api import deps
+from app.core import admission
+from app.core.config import settings
+from app.models.user import User
+from app.services import export
+from app.services.connections import manager
+from app.services.read_receipts import receipts
+
+router = APIRouter()
+
+@router.get("/export/{kind}", response_class=StreamingResponse)
+def export_work_data(
+    kind: Literal["records", "items"],
+    format: Literal["csv", "ndjson"] = "csv",
+    user_ids: Optional[List[int]] = Query(None),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_user: User = Depends(deps.get_current_admin_user)
+) -> Any:
+    """
+    Stream attendance records or work items of all (or the given) users as
+    CSV or NDJSON. start/end are inclusive days (record date, item
+    creation day).
+    """
+    body = export.stream(kind, format, user_ids, start, end, settings.EXPORT_CHUNK_SIZE)
+    filename = f"work_{kind}_{date.today().isoformat()}.{format}"
+    return StreamingResponse(
+        body,
+        media_type=export.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.get("/metrics/admission", response_model=dict)
+async def get_admission_metrics(
+    current_user: User = Depends(deps.get_current_admin_user)
+) -> Any:
+    """
+    Admission control counters (per route class) and threadpool usage of
+    the worker that answers. Async: the threadpool limiter can only be
+    read from the event loop.
+    """
+    return admission.metrics()
+
+@router.get("/metrics/websockets", response_model=dict)
+async def get_websocket_metrics(
+    current_user: User = Depends(deps.get_current_admin_user)
+) -> Any:
+    """
+    Open chat connections, reaping and read receipt counters of the worker
+    that answers. Async, so the connection sets are not read from a thread
+    while the event loop changes them.
+    """
+    return {**manager.metrics(), "read_receipts": receipts.metrics()}
@@ -1,63 +1,138 @@
-from typing import List, Any
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, UploadFile, File
+from typing import List, Any, Optional
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, UploadFile, File, Request, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
+from sqlalchemy import or_, and_, func, case
 from datetime import datetime, timezone, timedelta
-import shutil
-import os
-import uuid
-import json
 
 from app.db.repository import get_db
-from app.api import deps
-from app.models.chat import ChatMessage
+from app.api import deps, caching, serialization
+from app.api.models.user import User as UserSchema
+from app.models.chat import ChatMessage, ChatRoom
 from app.models.user import User
-from app.schemas.chat import ChatMessage as ChatMessageSchema, ChatMessageCreate
-from app.core import security
+from app.schemas.chat import ChatMessage as ChatMessageSchema, ChatMessageCreate, ChatRoom as ChatRoomSchema, ChatRoomCreate, ConversationPage
+from app.core import security, images, profiling
+from app.core.config import settings
+from app.services import chat_protocol, friend_graph
+from app.services.connections import LOBBY, manager
+from app.services.profiles import load_profiles
+from app.services.read_receipts import receipts
 
 router = APIRouter()
 
-# Store active connections for private chat
-# Dictionary mapping user_id to their WebSocket connection
-active_connections: dict[int, WebSocket] = {}
+# Column-only projections for history pages (see app/api/serialization.py)
+MESSAGE_FIELDS = serialization.Projection(ChatMessageSchema, ChatMessage, exclude=("sender",))
+SENDER_FIELDS = serialization.Projection(UserSchema, User)
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket, user_id: int):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        active_connections[user_id] = websocket
-
-    def disconnect(self, websocket: WebSocket, user_id: int):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-        if user_id in active_connections:
-            del active_connections[user_id]
+def query_messages(db: Session):
+    """
+    Message columns joined with their sender's profile columns.
+    """
+    return db.query(*MESSAGE_FIELDS.columns, *SENDER_FIELDS.columns).outerjoin(
+        User, User.id == ChatMessage.user_id
+    )
 
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            await connection.send_json(message)
+def serialize_messages(rows) -> List[dict]:
+    offset = len(MESSAGE_FIELDS)
+    messages = []
+    for row in rows:
+        message = MESSAGE_FIELDS.to_dict(row)
+        sender = SENDER_FIELDS.to_dict(row, offset)
+        message["sender"] = sender if sender["id"] is not None else None
+        messages.append(message)
+    return messages
 
-    async def send_personal_message(self, message: dict, user_id: int):
-        if user_id in active_connections:
-            await active_connections[user_id].send_json(message)
+def public_history(
+    request: Request, response: Response, db: Session,
+    room_id: Optional[int], skip: int, limit: int, before_id: Optional[int] = None
+) -> Any:
+    """
+    A page of lobby (room_id None) or room messages, served from
+    ix_chat_messages_room.
+    """
+    in_room = and_(ChatMessage.room_id == room_id, ChatMessage.to_user_id == None)
+    # Messages are append-only, so the newest id identifies the page contents
+    last_id = db.query(func.max(ChatMessage.id)).filter(in_room).scalar()
+    etag = caching.make_etag("chat_history", room_id, skip, limit, before_id, last_id, caching.profiles_version(db))
+    not_modified = caching.conditional(request, response, etag)
+    if not_modified:
+        return not_modified
 
-manager = ConnectionManager()
+    query = query_messages(db).filter(in_room)
+    if before_id is not None:
+        query = query.filter(ChatMessage.id < before_id)
+    rows = query.order_by(ChatMessage.id.desc()).offset(skip).limit(limit).all()
+    return serialization.json_list(serialize_messages(rows[::-1]), response) # Return in chronological order
 
 @router.get("/history", response_model=List[ChatMessageSchema])
 def get_chat_history(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 50,
+    before_id: Optional[int] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(deps.get_current_active_user)
 ) -> Any:
     """
     Get chat history (public lobby).
     """
-    messages = db.query(ChatMessage).filter(ChatMessage.to_user_id == None).order_by(ChatMessage.id.desc()).offset(skip).limit(limit).all()
-    return messages[::-1] # Return in chronological order
+    return public_history(request, response, db, LOBBY, skip, limit, before_id)
+
+@router.get("/rooms", response_model=List[ChatRoomSchema])
+def get_rooms(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_active_user)
+) -> Any:
+    """
+    All chat rooms, by name.
+    """
+    return db.query(ChatRoom).order_by(ChatRoom.name).all()
+
+@router.post("/rooms", response_model=ChatRoomSchema)
+def create_room(
+    room_in: ChatRoomCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_active_user)
+) -> Any:
+    """
+    Create a chat room. Members join it by subscribing over the WebSocket.
+    """
+    name = room_in.name.strip()
+    if not name:
+        raise HTTPException(status_code=400, detail="Room name is required")
+    if db.query(ChatRoom.id).filter(ChatRoom.name == name).first():
+        raise HTTPException(status_code=400, detail="Room already exists")
+
+    china_tz = timezone(timedelta(hours=8))
+    room = ChatRoom(
+        name=name,
+        description=room_in.description,
+        created_by=current_user.id,
+        created_at=datetime.now(china_tz).strftime("%Y-%m-%d %H:%M:%S")
+    )
+    db.add(room)
+    db.commit()
+    db.refresh(room)
+    return room
+
+@router.get("/rooms/{room_id}/history", response_model=List[ChatMessageSchema])
+def get_room_history(
+    room_id: int,
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 50,
+    before_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_active_user)
+) -> Any:
+    """
+    Get chat history of a room. Pass the oldest loaded id as `before_id`
+    to page back without an offset scan.
+    """
+    if db.get(ChatRoom, room_id) is None:
+        raise HTTPException(status_code=404, detail="Room not found")
+    return public_history(request, response, db, room_id, skip, limit, before_id)
 
 @router.get("/private/history", response_model=List[ChatMessageSchema])
 def get_private_chat_history(
@@ -70,14 +145,14 @@ def get_private_chat_history(
     """
     Get private chat history between current user and friend.
     """
-    messages = db.query(ChatMessage).filter(
+    rows = query_messages(db).filter(
         or_(
             and_(ChatMessage.user_id == current_user.id, ChatMessage.to_user_id == friend_id),
             and_(ChatMessage.user_id == friend_id, ChatMessage.to_user_id == current_user.id)
         )
     ).order_by(ChatMessage.id.desc()).offset(skip).limit(limit).all()
     
-    return messages[::-1]
+    return serialization.json_list(serialize_messages(rows[::-1]))
 
 from pydantic import BaseModel
 
@@ -91,7 +166,9 @@ def mark_messages_read(
     current_user: User = Depends(deps.get_current_active_user)
 ):
     """
-    Mark all messages from a friend as read.
+    Mark all messages from a friend as read. Connected clients send a
+    `read` frame over the WebSocket instead (batched, see
+    app/services/read_receipts.py).
     """
     try:
         # Update messages where sender is friend and receiver is current user
@@ -129,6 +206,79 @@ def get_unread_counts(
     
     return {user_id: count for user_id, count in results}
 
+@router.get("/conversations", response_model=ConversationPage)
+def get_conversations(
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_active_user)
+) -> Any:
+    """
+    Accepted friends with unread count and last private message, most
+    recent conversation first. Each page costs a fixed number of queries,
+    independent of the number of friends.
+    """
+    limit = max(1, min(limit, 200))
+    edges = friend_graph.get_graph(db).friend_edges(current_user.id)
+    if not edges:
+        return {"items": [], "next_cursor": None}
+
+    # Latest message id per conversation partner, one grouped query
+    other_id = case((ChatMessage.user_id == current_user.id, ChatMessage.to_user_id), else_=ChatMessage.user_id)
+    last_ids = dict(db.query(other_id, func.max(ChatMessage.id)).filter(
+        or_(
+            and_(ChatMessage.user_id == current_user.id, ChatMessage.to_user_id != None),
+            ChatMessage.to_user_id == current_user.id
+        )
+    ).group_by(other_id).all())
+
+    # Sort by (last message id, friendship id), newest first; the cursor is the last key of a page
+    def sort_key(edge):
+        return (last_ids.get(edge.other(current_user.id)) or 0, edge.id)
+
+    edges.sort(key=sort_key, reverse=True)
+    if cursor:
+        try:
+            after = tuple(int(part) for part in cursor.split("."))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        edges = [edge for edge in edges if sort_key(edge) < after]
+    page = edges[:limit]
+    next_cursor = "%d.%d" % sort_key(page[-1]) if len(edges) > limit else None
+
+    friend_ids = [edge.other(current_user.id) for edge in page]
+    profiles = load_profiles(db, friend_ids)
+    unread = dict(db.query(ChatMessage.user_id, func.count(ChatMessage.id)).filter(
+        ChatMessage.to_user_id == current_user.id,
+        ChatMessage.is_read == False,
+        ChatMessage.user_id.in_(friend_ids)
+    ).group_by(ChatMessage.user_id).all())
+
+    message_ids = [last_ids[friend_id] for friend_id in friend_ids if friend_id in last_ids]
+    last_messages = {}
+    if message_ids:
+        rows = db.query(
+            ChatMessage.id, ChatMessage.user_id, ChatMessage.to_user_id, ChatMessage.content,
+            ChatMessage.message_type, ChatMessage.created_at
+        ).filter(ChatMessage.id.in_(message_ids)).all()
+        for row in rows:
+            partner = row.to_user_id if row.user_id == current_user.id else row.user_id
+            last_messages[partner] = {
+                "id": row.id,
+                "user_id": row.user_id,
+                "content": row.content,
+                "message_type": row.message_type,
+                "created_at": row.created_at,
+            }
+
+    items = []
+    for edge, friend_id in zip(page, friend_ids):
+        item = friend_graph.edge_dict(edge, profiles.get(friend_id))
+        item["unread_count"] = unread.get(friend_id, 0)
+        item["last_message"] = last_messages.get(friend_id)
+        items.append(item)
+    return serialization.FastJSONResponse({"items": items, "next_cursor": next_cursor})
+
 @router.post("/upload", response_model=dict)
 def upload_chat_image(
     file: UploadFile = File(...),
@@ -136,27 +286,127 @@ def upload_chat_image(
 ):
     """
     Upload an image for chat.
+    Smaller variants are rendered in the background; their URLs are returned
+    alongside the original.
     """
-    # Ensure directory exists
-    upload_dir = "/Users/edric/Desktop/react/tbnt-api/data/image"
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    # Generate unique filename
-    file_ext = os.path.splitext(file.filename)[1]
-    if not file_ext:
-        file_ext = ".png" # Default to png if no extension
-        
-    filename = f"{uuid.uuid4()}{file_ext}"
-    file_path = os.path.join(upload_dir, filename)
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Default to png if no extension
+    filename = images.save_upload(file.file, file.filename, default_ext=".png")
+    images.schedule_variants(filename, images.CHAT_VARIANTS)
         
     # Return URL
-    return {"url": f"/static/{filename}"}
+    return {
+        "url": images.image_url(filename),
+        "variants": images.variant_urls(filename, images.CHAT_VARIANTS)
+    }
+
+
+async def handle_subscription(websocket: WebSocket, db: Session, data_json: dict) -> None:
+    """
+    {"type": "subscribe" | "unsubscribe", "room_id": <id or null for the lobby>}
+    """
+    room_id = data_json.get("room_id", LOBBY)
+
+    if data_json["type"] == "unsubscribe":
+        manager.unsubscribe(websocket, room_id)
+        await manager.send(websocket, {"type": "unsubscribed", "room_id": room_id})
+        return
+
+    if room_id is not LOBBY and db.get(ChatRoom, room_id) is None:
+        await manager.send(websocket, {"type": "error", "detail": "Room not found"})
+        return
+    if not manager.subscribe(websocket, room_id):
+        await manager.send(websocket, {"type": "error", "detail": "Too many rooms"})
+        return
+    await manager.send(websocket, {"type": "subscribed", "room_id": room_id})
+
+async def handle_read(websocket: WebSocket, user: User, data_json: dict) -> None:
+    """
+    {"type": "read", "friend_id": <id>, "message_id": <newest id shown>}
+    """
+    friend_id, message_id = data_json.get("friend_id"), data_json.get("message_id")
+    if friend_id is None or message_id is None:
+        await manager.send(websocket, {"type": "error", "detail": "friend_id and message_id are required"})
+        return
+    receipts.mark(user.id, friend_id, message_id)
+
+async def handle_message(websocket: WebSocket, db: Session, user: User, data: chat_protocol.Frame) -> None:
+    """
+    Store and deliver one message received over the WebSocket.
+    """
+    # Parse data; malformed frames get an error frame, the connection stays open
+    try:
+        data_json = chat_protocol.parse(data)
+    except chat_protocol.FrameError as e:
+        await manager.send(websocket, {"type": "error", "detail": str(e)})
+        return
+
+    if data_json.get("type") == "pong":
+        return
+    if data_json.get("type") == "ping":
+        await manager.send(websocket, {"type": "pong"})
+        return
+    if data_json.get("type") == "read":
+        await handle_read(websocket, user, data_json)
+        return
+    if data_json.get("type") in ("subscribe", "unsubscribe"):
+        await handle_subscription(websocket, db, data_json)
+        return
+    content = data_json.get("content") or ""
+    message_type = data_json.get("type") or "text"
+    to_user_id = data_json.get("to_user_id") # Optional target for private message
+    room_id = data_json.get("room_id", LOBBY) # Optional room, default the lobby
+
+    if to_user_id:
+        room_id = LOBBY # Private messages belong to no room
+    elif room_id is not LOBBY and not manager.is_subscribed(websocket, room_id):
+        await manager.send(websocket, {"type": "error", "detail": "Subscribe to the room first"})
+        return
+
+    # Save message
+    china_tz = timezone(timedelta(hours=8))
+    now = datetime.now(china_tz)
+    now_str = now.strftime("%Y-%m-%d %H:%M:%S")
+
+    message = ChatMessage(
+        user_id=user.id,
+        content=content,
+        message_type=message_type,
+        created_at=now_str,
+        to_user_id=to_user_id,
+        room_id=room_id
+    )
+    db.add(message)
+    db.commit()
+    db.refresh(message)
 
+    # Prepare response
+    response = {
+        "id": message.id,
+        "content": message.content,
+        "message_type": message.message_type,
+        "created_at": message.created_at,
+        "user_id": user.id,
+        "to_user_id": message.to_user_id,
+        "room_id": message.room_id,
+        "is_read": False,
+        "sender": {
+            "id": user.id,
+            "username": user.username,
+            "nickname": user.nickname,
+            "avatar": user.avatar,
+            "chat_color": user.chat_color,
+            "number": user.number
+        }
+    }
+
+    if to_user_id:
+        # Private Message: Send to sender and receiver only
+        await manager.send_personal_message(response, user.id) # Echo back to sender
+        await manager.send_personal_message(response, to_user_id)
+    else:
+        # Public Message: Broadcast to the subscribers of its room
+        await manager.broadcast(response, room_id)
 
-@router.websocket("/ws/{token}")
 async def websocket_endpoint(websocket: WebSocket, token: str, db: Session = Depends(get_db)):
     # Verify token
     try:
@@ -180,63 +430,29 @@ async def websocket_endpoint(websocket: WebSocket, token: str, db: Session = Dep
         await websocket.close(code=1008)
         return
 
-    await manager.connect(websocket, user.id)
+    # Wire format requested through Sec-WebSocket-Protocol (see app/services/chat_protocol.py)
+    protocol = chat_protocol.negotiate(websocket.scope.get("subprotocols") or ())
+    await manager.connect(websocket, user.id, protocol)
     try:
         while True:
-            data_str = await websocket.receive_text()
-            
-            # Parse data
-            try:
-                data_json = json.loads(data_str)
-                content = data_json.get("content", "")
-                message_type = data_json.get("type", "text")
-                to_user_id = data_json.get("to_user_id", None) # Optional target for private message
-            except json.JSONDecodeError:
-                content = data_str
-                message_type = "text"
-                to_user_id = None
-            
-            # Save message
-            china_tz = timezone(timedelta(hours=8))
-            now = datetime.now(china_tz)
-            now_str = now.strftime("%Y-%m-%d %H:%M:%S")
-            
-            message = ChatMessage(
-                user_id=user.id,
-                content=content,
-                message_type=message_type,
-                created_at=now_str,
-                to_user_id=to_user_id
-            )
-            db.add(message)
-            db.commit()
-            db.refresh(message)
-            
-            # Prepare response
-            response = {
-                "id": message.id,
-                "content": message.content,
-                "message_type": message.message_type,
-                "created_at": message.created_at,
-                "user_id": user.id,
-                "to_user_id": message.to_user_id,
-                "sender": {
-                    "id": user.id,
-                    "username": user.username,
-                    "nickname": user.nickname,
-                    "avatar": user.avatar,
-                    "chat_color": user.chat_color,
-                    "number": user.number
-                }
-            }
-            
-            if to_user_id:
-                # Private Message: Send to sender and receiver only
-                await manager.send_personal_message(response, user.id) # Echo back to sender
-                await manager.send_personal_message(response, int(to_user_id))
-            else:
-                # Public Message: Broadcast to all
-                await manager.broadcast(response)
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            data = frame.get("text") if frame.get("text") is not None else frame.get("bytes")
+            # Any frame, including a pong, shows the connection is alive
+            manager.touch(websocket)
+            # Sampled messages are profiled one by one (see app/core/profiling.py)
+            async with profiling.maybe_profile("/chat/ws/{token}", "websocket"):
+                await handle_message(websocket, db, user, data)
             
     except WebSocketDisconnect:
+        pass
+    finally:
+        # Also on errors and when the heartbeat reaped the socket
         manager.disconnect(websocket, user.id)
+
+
+# Chat state (app/services/connections.py, read_receipts.py) is per process:
+# app.commands.serve runs a single worker while this route is served
+if settings.CHAT_WEBSOCKET:
+    router.add_api_websocket_route("/ws/{token}", websocket_endpoint)
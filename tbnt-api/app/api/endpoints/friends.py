@@ -1,16 +1,31 @@
 from typing import List, Any
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
 
 from app.db.repository import get_db
-from app.api import deps
+from app.api import deps, caching, serialization
 from app.models.friend import Friendship
 from app.models.user import User
-from app.schemas.friend import Friendship as FriendshipSchema, FriendshipCreate, FriendshipUpdate
+from app.schemas.friend import (
+    Friendship as FriendshipSchema,
+    FriendshipCreate,
+    FriendshipUpdate,
+    FriendSuggestion,
+    MutualFriends
+)
+from app.services import friend_graph
+from app.services.profiles import PUBLIC_PROFILE_FIELDS, load_profiles
 
 router = APIRouter()
 
+def serialize_edges(db: Session, edges: List[friend_graph.Edge], user_id: int) -> List[dict]:
+    """
+    Friendship dicts with friend_info set to the side that is not user_id.
+    """
+    profiles = load_profiles(db, {edge.other(user_id) for edge in edges})
+    edges = sorted(edges, key=lambda edge: edge.id)
+    return [friend_graph.edge_dict(edge, profiles.get(edge.other(user_id))) for edge in edges]
+
 @router.post("/request", response_model=FriendshipSchema)
 def send_friend_request(
     request_in: FriendshipCreate,
@@ -29,12 +44,8 @@ def send_friend_request(
         raise HTTPException(status_code=400, detail="You cannot add yourself as a friend")
 
     # 2. Check if friendship already exists
-    existing_friendship = db.query(Friendship).filter(
-        or_(
-            and_(Friendship.user_id == current_user.id, Friendship.friend_id == target_user.id),
-            and_(Friendship.user_id == target_user.id, Friendship.friend_id == current_user.id)
-        )
-    ).first()
+    graph = friend_graph.get_graph(db)
+    existing_friendship = graph.edge(current_user.id, target_user.id)
 
     if existing_friendship:
         if existing_friendship.status == 1:
@@ -56,6 +67,7 @@ def send_friend_request(
     db.add(friendship)
     db.commit()
     db.refresh(friendship)
+    graph.apply(friendship)
     
     # Attach info for response
     friendship.friend_info = target_user
@@ -63,44 +75,100 @@ def send_friend_request(
 
 @router.get("/requests", response_model=List[FriendshipSchema])
 def get_friend_requests(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(deps.get_current_active_user)
 ) -> Any:
     """
     Get pending friend requests (received).
     """
-    requests = db.query(Friendship).filter(
-        Friendship.friend_id == current_user.id,
-        Friendship.status == 0
-    ).all()
-    
+    graph = friend_graph.get_graph(db)
+    edges = graph.incoming_edges(current_user.id)
+    etag = caching.make_etag(
+        "friend_requests", current_user.id, *graph.version_of(edges), caching.profiles_version(db)
+    )
+    not_modified = caching.conditional(request, response, etag)
+    if not_modified:
+        return not_modified
+
     # Populate requester info
-    for req in requests:
-        req.friend_info = req.requester
-        
-    return requests
+    return serialization.json_list(serialize_edges(db, edges, current_user.id), response)
 
 @router.get("/", response_model=List[FriendshipSchema])
 def get_friends(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(deps.get_current_active_user)
 ) -> Any:
     """
     Get accepted friends.
     """
-    friendships = db.query(Friendship).filter(
-        or_(Friendship.user_id == current_user.id, Friendship.friend_id == current_user.id),
-        Friendship.status == 1
-    ).all()
-    
+    graph = friend_graph.get_graph(db)
+    edges = graph.friend_edges(current_user.id)
+    etag = caching.make_etag(
+        "friends", current_user.id, *graph.version_of(edges), caching.profiles_version(db)
+    )
+    not_modified = caching.conditional(request, response, etag)
+    if not_modified:
+        return not_modified
+
     # Populate friend info
-    for f in friendships:
-        if f.user_id == current_user.id:
-            f.friend_info = f.target
-        else:
-            f.friend_info = f.requester
-            
-    return friendships
+    return serialization.json_list(serialize_edges(db, edges, current_user.id), response)
+
+@router.get("/suggestions", response_model=List[FriendSuggestion])
+def get_friend_suggestions(
+    limit: int = 10,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_active_user)
+) -> Any:
+    """
+    People you may know: friends of friends ranked by mutual friends.
+    """
+    # Imported on first use, numpy is the heaviest import of a worker
+    from app.services import friend_suggestions
+
+    graph = friend_graph.get_graph(db)
+    index = friend_suggestions.get_index(graph)
+    # Skip people with a pending request in either direction
+    pending = {edge.other(current_user.id) for edge in graph.incoming_edges(current_user.id)}
+    pending |= {edge.other(current_user.id) for edge in graph.outgoing_edges(current_user.id)}
+
+    limit = max(1, min(limit, 50))
+    suggestions = [
+        (user_id, count) for user_id, count in index.suggest(current_user.id, limit + len(pending))
+        if user_id not in pending and not graph.are_friends(current_user.id, user_id)
+    ][:limit]
+    profiles = load_profiles(db, [user_id for user_id, _ in suggestions], PUBLIC_PROFILE_FIELDS)
+    return serialization.FastJSONResponse([
+        {"user": profiles[user_id], "mutual_count": count}
+        for user_id, count in suggestions if user_id in profiles
+    ])
+
+@router.get("/mutual/{user_id}", response_model=MutualFriends)
+def get_mutual_friends(
+    user_id: int,
+    limit: int = 20,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(deps.get_current_active_user)
+) -> Any:
+    """
+    Friends the current user has in common with another user.
+    """
+    graph = friend_graph.get_graph(db)
+    # Answered from the live graph rather than the suggestion index: it is
+    # up to date (the index lags by up to SUGGESTIONS_REFRESH, so a new
+    # friend would be missing), and intersecting two adjacency sets is
+    # linear in the two degrees, no slower than np.intersect1d (a sort of
+    # both CSR rows)
+    mutual = sorted(graph.friend_ids(current_user.id) & graph.friend_ids(user_id))
+    profiles = load_profiles(db, mutual[:max(0, limit)])
+    return serialization.FastJSONResponse({
+        "user_id": user_id,
+        "mutual_count": len(mutual),
+        "mutual_friends": [profiles[i] for i in mutual[:max(0, limit)] if i in profiles],
+    })
 
 @router.put("/{friendship_id}", response_model=FriendshipSchema)
 def respond_friend_request(
@@ -122,6 +190,7 @@ def respond_friend_request(
     friendship.status = status_in.status
     db.commit()
     db.refresh(friendship)
+    friend_graph.get_graph(db).apply(friendship)
     
     friendship.friend_info = friendship.requester
     return friendship
@@ -135,18 +204,14 @@ def delete_friend(
     """
     Delete a friend.
     """
-    friendship = db.query(Friendship).filter(
-        or_(
-            and_(Friendship.user_id == current_user.id, Friendship.friend_id == friend_id),
-            and_(Friendship.user_id == friend_id, Friendship.friend_id == current_user.id)
-        ),
-        Friendship.status == 1
-    ).first()
+    graph = friend_graph.get_graph(db)
+    edge = graph.edge(current_user.id, friend_id)
     
-    if not friendship:
+    if not edge or edge.status != friend_graph.ACCEPTED:
         raise HTTPException(status_code=404, detail="Friendship not found")
         
-    db.delete(friendship)
+    db.query(Friendship).filter(Friendship.id == edge.id).delete(synchronize_session=False)
     db.commit()
+    graph.remove(edge)
     
     return {"message": "Friend deleted"}
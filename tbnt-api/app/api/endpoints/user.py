@@ -1,15 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm
-import shutil
-import os
-import uuid
 import random
 
 from app.db.repository import get_db
 from app.models.user import User as UserModel
 from app.api.models import user as user_schema
-from app.core import security
+from app.core import security, images
+from app.core.config import settings
 from app.api import deps
 
 router = APIRouter()
@@ -37,7 +35,7 @@ def register(user_in: user_schema.UserCreate, db: Session = Depends(get_db)):
         nickname=user_in.nickname,
         avatar=user_in.avatar,
         phone=user_in.phone,
-        role_level=user_in.role_level if user_in.role_level is not None else 5,
+        role_level=settings.DEFAULT_ROLE_LEVEL, # Never taken from the request
         hashed_password=security.get_password_hash(user_in.password),
         chat_color=generate_random_color(),
         number=number
@@ -104,21 +102,13 @@ def upload_avatar(
     file: UploadFile = File(...),
     current_user: UserModel = Depends(deps.get_current_active_user)
 ):
-    # Ensure directory exists
-    upload_dir = "/Users/edric/Desktop/react/tbnt-api/data/image"
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    # Generate unique filename
-    file_ext = os.path.splitext(file.filename)[1]
-    filename = f"{uuid.uuid4()}{file_ext}"
-    file_path = os.path.join(upload_dir, filename)
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    filename = images.save_upload(file.file, file.filename)
+    images.schedule_variants(filename, images.AVATAR_VARIANTS)
         
     # Return relative URL (assuming static mount is /static)
-    # Actually, we should return full URL or path. Frontend will prepend base URL.
-    # Let's return just the filename or relative path.
     # Frontend can use http://localhost:8000/static/{filename}
-    return {"url": f"/static/{filename}"}
-
+    # Resized variants (e.g. the 64px avatar) are listed under "variants".
+    return {
+        "url": images.image_url(filename),
+        "variants": images.variant_urls(filename, images.AVATAR_VARIANTS)
+    }
@@ -1,9 +1,10 @@
-from typing import List, Any
-from datetime import datetime, timezone, timedelta
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Any, Callable, Literal, Optional
+from datetime import date, datetime, timezone, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import and_, func, or_
 from sqlalchemy.orm import Session
-from app.api import deps
-from app.models.work import WorkSettings, WorkItem, WorkRecord
+from app.api import deps, caching, serialization
+from app.models.work import WorkSettings, WorkItem, WorkRecord, WorkDay
 from app.schemas.work import (
     WorkSettings as WorkSettingsSchema,
     WorkSettingsCreate,
@@ -11,12 +12,106 @@ from app.schemas.work import (
     WorkItem as WorkItemSchema,
     WorkItemCreate,
     WorkItemUpdate,
-    WorkRecord as WorkRecordSchema
+    WorkItemPage,
+    WorkItemBatch,
+    WorkItemBatchResult,
+    WorkItemChanges,
+    WorkRecord as WorkRecordSchema,
+    WorkRecordPage,
+    WorkStats
 )
 from app.models.user import User
+from app.services import work_stats, work_sync
 
 router = APIRouter()
 
+# Column-only projections for list endpoints (see app/api/serialization.py)
+ITEM_FIELDS = serialization.Projection(WorkItemSchema, WorkItem)
+RECORD_FIELDS = serialization.Projection(WorkRecordSchema, WorkRecord)
+
+MAX_PAGE_SIZE = 200
+MAX_BATCH_SIZE = 500
+
+def item_filters(user_id: int, type: Optional[str], status: Optional[str],
+                 start: Optional[date], end: Optional[date]) -> list:
+    """
+    Filters for work item listings; start/end are inclusive days of created_at.
+    """
+    filters = [WorkItem.user_id == user_id]
+    if type:
+        filters.append(WorkItem.type == type)
+    if status:
+        filters.append(WorkItem.status == status)
+    if start:
+        filters.append(WorkItem.created_at >= datetime.combine(start, datetime.min.time()))
+    if end:
+        filters.append(WorkItem.created_at < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    return filters
+
+def record_filters(user_id: int, start: Optional[date], end: Optional[date]) -> list:
+    """
+    Filters for work record listings; start/end are inclusive dates.
+    """
+    filters = [WorkRecord.user_id == user_id]
+    # YYYY-MM-DD strings compare like dates
+    if start:
+        filters.append(WorkRecord.date >= start.isoformat())
+    if end:
+        filters.append(WorkRecord.date <= end.isoformat())
+    return filters
+
+def split_cursor(cursor: str) -> tuple:
+    """
+    Cursors are "<sort value>.<id>" of the last row of the previous page;
+    an empty sort value stands for NULL.
+    """
+    value, _, last_id = cursor.rpartition(".")
+    try:
+        return value, int(last_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_page(
+    db: Session, fields: serialization.Projection, filters: list, column, model,
+    cursor: Optional[str], limit: int, parse: Callable[[str], Any]
+) -> dict:
+    """
+    One page of rows ordered by (column, id) descending, read as an index
+    range after the cursor. Rows whose column is NULL sort last and are
+    paged by id alone: SQLite leaves NULL out of `column < value`, so they
+    are topped up by a second range read once the dated rows run out.
+    """
+    order = (column.desc(), model.id.desc())
+    after_value = False
+    if cursor:
+        value, last_id = split_cursor(cursor)
+        if not value:
+            filters = filters + [column.is_(None), model.id < last_id]
+        else:
+            try:
+                value = parse(value)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            filters = filters + [or_(column < value, and_(column == value, model.id < last_id))]
+            after_value = True
+
+    rows = db.query(*fields.columns).filter(*filters).order_by(*order).limit(limit + 1).all()
+    if after_value and len(rows) <= limit:
+        rows += db.query(*fields.columns).filter(*filters[:-1], column.is_(None)).order_by(
+            *order
+        ).limit(limit + 1 - len(rows)).all()
+    items = [fields.to_dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        value = last[column.key]
+        if value is None:
+            value = ""
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        next_cursor = f"{value}.{last['id']}"
+    return {"items": items, "next_cursor": next_cursor}
+
 # --- Work Settings ---
 
 @router.get("/settings", response_model=WorkSettingsSchema)
@@ -60,17 +155,52 @@ def update_work_settings(
 
 @router.get("/items", response_model=List[WorkItemSchema])
 def get_work_items(
+    request: Request,
+    response: Response,
     type: str = None,
+    status: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_user)
 ) -> Any:
     """
-    Get work items (memos, plans, progress).
+    Get work items (memos, plans, progress). Use /items/page for long histories.
     """
-    query = db.query(WorkItem).filter(WorkItem.user_id == current_user.id)
-    if type:
-        query = query.filter(WorkItem.type == type)
-    return query.all()
+    filters = item_filters(current_user.id, type, status, start, end)
+
+    version = db.query(
+        func.count(WorkItem.id), func.max(WorkItem.id), func.max(WorkItem.updated_at)
+    ).filter(*filters).one()
+    etag = caching.make_etag("work_items", current_user.id, type, status, start, end, *version)
+    not_modified = caching.conditional(request, response, etag)
+    if not_modified:
+        return not_modified
+
+    rows = db.query(*ITEM_FIELDS.columns).filter(*filters).all()
+    return serialization.json_list([ITEM_FIELDS.to_dict(row) for row in rows], response)
+
+@router.get("/items/page", response_model=WorkItemPage)
+def get_work_items_page(
+    type: Optional[str] = None,
+    status: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_user)
+) -> Any:
+    """
+    Work items newest first, one page at a time. Each page is a single
+    range read of ix_work_items_user_type_created (with `type`) or
+    ix_work_items_user_created (without).
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    filters = item_filters(current_user.id, type, status, start, end)
+    return serialization.FastJSONResponse(keyset_page(
+        db, ITEM_FIELDS, filters, WorkItem.created_at, WorkItem, cursor, limit, datetime.fromisoformat
+    ))
 
 @router.post("/items", response_model=WorkItemSchema)
 def create_work_item(
@@ -81,8 +211,8 @@ def create_work_item(
     """
     Create a new work item.
     """
-    item = WorkItem(**item_in.model_dump(), user_id=current_user.id)
-    db.add(item)
+    version = work_sync.next_version(db, current_user.id)
+    item = work_sync.create_item(db, current_user.id, item_in.model_dump(), version)
     db.commit()
     db.refresh(item)
     return item
@@ -101,11 +231,8 @@ def update_work_item(
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     
-    update_data = item_in.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(item, field, value)
-    
-    db.add(item)
+    version = work_sync.next_version(db, current_user.id)
+    work_sync.update_item(item, item_in.model_dump(exclude_unset=True), version)
     db.commit()
     db.refresh(item)
     return item
@@ -123,10 +250,82 @@ def delete_work_item(
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     
-    db.delete(item)
+    version = work_sync.next_version(db, current_user.id)
+    work_sync.delete_item(db, item, version)
     db.commit()
     return item
 
+@router.post("/items/batch", response_model=WorkItemBatchResult)
+def batch_work_items(
+    batch: WorkItemBatch,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_user)
+) -> Any:
+    """
+    Apply creates, updates and deletes in order, in one transaction. If any
+    operation fails nothing is applied.
+    """
+    operations = batch.operations
+    if len(operations) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} operations per batch")
+
+    # Everything the batch touches, in one query
+    ids = {op.id for op in operations if op.op != "create"}
+    items = {}
+    if ids:
+        items = {item.id: item for item in db.query(WorkItem).filter(
+            WorkItem.user_id == current_user.id, WorkItem.id.in_(ids)
+        )}
+
+    version = work_sync.next_version(db, current_user.id)
+    applied = []
+    for index, op in enumerate(operations):
+        data = op.model_dump(exclude_unset=True, exclude={"op", "id", "client_id"})
+        if op.op == "create":
+            if not op.type or op.content is None:
+                db.rollback()
+                raise HTTPException(status_code=400, detail=f"Operation {index}: create needs type and content")
+            applied.append((op, work_sync.create_item(db, current_user.id, data, version)))
+            continue
+        item = items.get(op.id)
+        if item is None:
+            db.rollback()
+            raise HTTPException(status_code=404, detail=f"Operation {index}: item {op.id} not found")
+        if op.op == "update":
+            applied.append((op, work_sync.update_item(item, data, version)))
+        else:
+            work_sync.delete_item(db, item, version)
+            del items[op.id]
+            applied.append((op, None))
+
+    # Assign ids to created items, then build the response before commit expires them
+    db.flush()
+    results = [
+        {
+            "op": op.op,
+            "id": item.id if item is not None else op.id,
+            "client_id": op.client_id,
+            "item": {key: getattr(item, key) for key in ITEM_FIELDS.keys} if item is not None else None,
+        }
+        for op, item in applied
+    ]
+    db.commit()
+    return serialization.FastJSONResponse({"version": version, "results": results})
+
+@router.get("/items/changes", response_model=WorkItemChanges)
+def get_work_item_changes(
+    since: int = 0,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_user)
+) -> Any:
+    """
+    Items created or updated and ids of items deleted after version `since`
+    (from a previous sync or batch). since=0 returns everything.
+    """
+    delta = work_sync.changes(db, current_user.id, since, ITEM_FIELDS.columns)
+    delta["items"] = [ITEM_FIELDS.to_dict(row) for row in delta["items"]]
+    return serialization.FastJSONResponse(delta)
+
 # --- Work Records ---
 
 @router.post("/clock-out", response_model=WorkRecordSchema)
@@ -142,15 +341,15 @@ def clock_out(
     today = now.strftime("%Y-%m-%d")
     now_str = now.strftime("%Y-%m-%d %H:%M:%S")
     
-    # Check if there is already a record for today
+    # Check if there is already a record for today (the first one, see work_stats.record_day)
     record = db.query(WorkRecord).filter(
         WorkRecord.user_id == current_user.id,
         WorkRecord.date == today
-    ).first()
+    ).order_by(WorkRecord.id).first()
 
+    settings = db.query(WorkSettings).filter(WorkSettings.user_id == current_user.id).first()
     if not record:
-        # Get user settings for start time
-        settings = db.query(WorkSettings).filter(WorkSettings.user_id == current_user.id).first()
+        # Use the user's start time as clock-in
         start_time_str = "09:00:00"
         if settings and settings.start_time:
             # Ensure format is HH:MM:SS
@@ -168,9 +367,11 @@ def clock_out(
             clock_out_time=now_str
         )
         db.add(record)
+        db.flush()
     else:
         record.clock_out_time = now_str
-    
+
+    work_stats.record_day(db, record, work_stats.end_time_of(settings))
     db.commit()
     db.refresh(record)
     return record
@@ -193,10 +394,77 @@ def get_today_work_record(
 
 @router.get("/records", response_model=List[WorkRecordSchema])
 def get_work_records(
+    request: Request,
+    response: Response,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_user)
 ) -> Any:
     """
-    Get work history records.
+    Get work history records. Use /records/page for long histories.
     """
-    return db.query(WorkRecord).filter(WorkRecord.user_id == current_user.id).order_by(WorkRecord.date.desc()).all()
+    filters = record_filters(current_user.id, start, end)
+
+    # Records only change by clock-out, which moves clock_out_time forward
+    version = db.query(
+        func.count(WorkRecord.id), func.max(WorkRecord.id), func.max(WorkRecord.clock_out_time)
+    ).filter(*filters).one()
+    etag = caching.make_etag("work_records", current_user.id, start, end, *version)
+    not_modified = caching.conditional(request, response, etag)
+    if not_modified:
+        return not_modified
+
+    rows = db.query(*RECORD_FIELDS.columns).filter(*filters).order_by(WorkRecord.date.desc()).all()
+    return serialization.json_list([RECORD_FIELDS.to_dict(row) for row in rows], response)
+
+@router.get("/records/page", response_model=WorkRecordPage)
+def get_work_records_page(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_user)
+) -> Any:
+    """
+    Work records newest day first, one page at a time (a range read of
+    ix_work_records_user_date).
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    filters = record_filters(current_user.id, start, end)
+    return serialization.FastJSONResponse(keyset_page(
+        db, RECORD_FIELDS, filters, WorkRecord.date, WorkRecord, cursor, limit, str
+    ))
+
+@router.get("/stats", response_model=WorkStats)
+def get_work_stats(
+    request: Request,
+    response: Response,
+    period: Literal["day", "week", "month"] = "month",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_user)
+) -> Any:
+    """
+    Worked hours, overtime and streaks grouped by day, week or month.
+    Defaults to the last 365 days.
+    """
+    china_tz = timezone(timedelta(hours=8))
+    today = datetime.now(china_tz).date()
+    end = end or today
+    start = start or end - timedelta(days=364)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+
+    version = db.query(func.count(WorkDay.id), func.max(WorkDay.updated_at)).filter(
+        WorkDay.user_id == current_user.id
+    ).one()
+    # today is part of the tag because the current streak depends on it
+    etag = caching.make_etag("work_stats", current_user.id, period, start, end, today, *version)
+    not_modified = caching.conditional(request, response, etag)
+    if not_modified:
+        return not_modified
+
+    return work_stats.statistics(db, current_user.id, start, end, period, today)
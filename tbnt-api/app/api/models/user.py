@@ -7,22 +7,35 @@ class UserBase(BaseModel):
     nickname: Optional[str] = None
     avatar: Optional[str] = None
     phone: Optional[str] = None
-    role_level: int = 5
     chat_color: Optional[str] = None # Random color for chat bubble
 
-# Properties to receive via API on creation
+# Properties to receive via API on creation. The role is assigned by the
+# server (DEFAULT_ROLE_LEVEL), see app.commands.set_role
 class UserCreate(UserBase):
     password: str
 
 # Properties to return to client
 class User(UserBase):
     id: int
+    role_level: int = 5
     is_active: bool
     number: Optional[int] = None
 
     class Config:
         from_attributes = True
 
+# Profile shown to people who are not (yet) friends: no phone, no role
+class PublicUser(BaseModel):
+    id: int
+    username: str
+    nickname: Optional[str] = None
+    avatar: Optional[str] = None
+    chat_color: Optional[str] = None
+    number: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
 class Token(BaseModel):
     access_token: str
     token_type: str
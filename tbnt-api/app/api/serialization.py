@@ -0,0 +1,57 @@
+"""
+Fast path for list responses.
+
+Instead of loading ORM objects and letting FastAPI validate them attribute
+by attribute against the response_model (and then JSON-encode the result
+in a second pass), hot list endpoints select only the columns the schema
+needs, build plain dicts and encode them once with pydantic-core's JSON
+serializer. The routes keep their response_model, so the OpenAPI schema
+does not change.
+"""
+from typing import Any, Dict, List, Optional, Sequence, Type
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse encoded by pydantic-core (handles datetimes like the
+    response models do).
+    """
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
+
+
+class Projection:
+    """
+    The columns of an ORM model that appear in a response schema.
+    """
+
+    def __init__(self, schema: Type[BaseModel], model: Any, exclude: Sequence[str] = ()):
+        table_columns = model.__table__.columns
+        self.keys = [
+            name for name in schema.model_fields
+            if name in table_columns and name not in exclude
+        ]
+        self.columns = [getattr(model, name) for name in self.keys]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def to_dict(self, row: Sequence[Any], offset: int = 0) -> Dict[str, Any]:
+        return dict(zip(self.keys, row[offset:offset + len(self.keys)]))
+
+
+def json_list(items: List[Any], response: Optional[Response] = None) -> FastJSONResponse:
+    """
+    Encode already projected rows. Headers set on the injected `response`
+    (e.g. the ETag from caching.conditional) are carried over.
+    """
+    headers = None
+    if response is not None:
+        headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+    return FastJSONResponse(items, headers=headers)
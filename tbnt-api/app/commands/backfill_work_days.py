@@ -0,0 +1,29 @@
+"""
+Build the work_days rollup from existing work records.
+
+    python -m app.commands.backfill_work_days [--user USER_ID]
+
+Clock-out keeps the rollup up to date afterwards. Safe to re-run: the
+rollup rows of the selected users are rebuilt from scratch.
+"""
+import argparse
+
+from app.db.migrations import upgrade_schema
+from app.db.repository import SessionLocal, engine
+from app.models import chat, friend, user, work  # noqa: F401  (register all mappers)
+from app.services import work_stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--user", type=int, help="only rebuild this user's rollup")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    upgrade_schema(engine)
+    db = SessionLocal()
+    try:
+        written = work_stats.backfill(db, user_id=args.user, batch_size=args.batch_size)
+    finally:
+        db.close()
+    print(f"Wrote {written} work day rows")
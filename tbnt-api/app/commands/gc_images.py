@@ -0,0 +1,24 @@
+"""
+Delete uploaded images that no message or avatar references any more.
+
+    python -m app.commands.gc_images [--all]
+
+Without --all a single incremental step is run, exactly like the
+scheduled job in the API process.
+"""
+import argparse
+
+from app.services import image_gc
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--all", action="store_true", help="scan every shard in one go")
+    args = parser.parse_args()
+
+    shards = len(image_gc.all_shards()) if args.all else None
+    deleted = image_gc.run_step(shards_per_run=shards)
+    if deleted is None:
+        print("Another garbage collection is running")
+    else:
+        print(f"Deleted {deleted} unreferenced files")
@@ -0,0 +1,87 @@
+"""
+Work with the request profiles written by app/core/profiling.py.
+
+    python -m app.commands.profiles token [--ttl 3600]
+        Print a value for the X-Profile header that forces profiling.
+
+    python -m app.commands.profiles list
+        One line per stored profile: time, route, status, latency, samples
+        and concurrency (requests in flight, including this one).
+
+    python -m app.commands.profiles collapse [--route /chat] [--min-latency 100] [--solo] [-o out.folded]
+        Merge the matching profiles into one collapsed-stack file
+        ("thread;frame;frame count" per line), ready for flamegraph.pl,
+        speedscope or inferno. Samples cover the whole process; --solo keeps
+        only profiles recorded while nothing else was in flight.
+"""
+import argparse
+import json
+import sys
+from collections import Counter
+from datetime import datetime
+from typing import Iterator, Optional
+
+from app.core import profiling
+from app.core.config import settings
+
+
+def load_profiles(route: Optional[str] = None, min_latency: float = 0, solo: bool = False) -> Iterator[dict]:
+    directory = settings.PROFILE_DIR
+    if not directory.is_dir():
+        return
+    for path in sorted(directory.glob("*.json")):
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue  # Rotated away or half written
+        if route and route not in data.get("route", ""):
+            continue
+        if data.get("latency_ms", 0) < min_latency:
+            continue
+        if solo and data.get("concurrent") != 1:
+            continue
+        yield data
+
+
+def collapse(profiles: Iterator[dict], by_route: bool = False) -> Counter:
+    merged: Counter = Counter()
+    for data in profiles:
+        # Optionally root each stack at its route so flame graphs split by endpoint
+        prefix = f"{data.get('route')};" if by_route else ""
+        for stack, count in data.get("samples", {}).items():
+            merged[prefix + stack] += count
+    return merged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    token = commands.add_parser("token")
+    token.add_argument("--ttl", type=int, default=3600, help="seconds the token stays valid")
+    listing = commands.add_parser("list")
+    listing.add_argument("--route", help="only routes containing this")
+    folded = commands.add_parser("collapse")
+    folded.add_argument("--route", help="only routes containing this")
+    folded.add_argument("--min-latency", type=float, default=0, help="only profiles slower than this (ms)")
+    folded.add_argument("--solo", action="store_true", help="only profiles without concurrent requests")
+    folded.add_argument("--by-route", action="store_true", help="prefix stacks with the route")
+    folded.add_argument("-o", "--output", help="file to write (default stdout)")
+    args = parser.parse_args()
+
+    if args.command == "token":
+        print(profiling.make_token(args.ttl))
+    elif args.command == "list":
+        for data in load_profiles(args.route):
+            recorded = datetime.fromtimestamp(data["recorded_at"]).strftime("%Y-%m-%d %H:%M:%S")
+            samples = sum(data["samples"].values())
+            print(f"{recorded}  {data['kind']:<9} {data.get('status') or '-':>3}  "
+                  f"{data['latency_ms']:9.1f} ms  {samples:6d}  {data.get('concurrent', '?'):>3}  {data['route']}")
+    else:
+        merged = collapse(load_profiles(args.route, args.min_latency, args.solo), args.by_route)
+        out = open(args.output, "w") if args.output else sys.stdout
+        try:
+            for stack, count in merged.most_common():
+                out.write(f"{stack} {count}\n")
+        finally:
+            if args.output:
+                out.close()
@@ -0,0 +1,112 @@
+"""
+Production server: one-time bootstrap in the master, then uvicorn workers
+sharing the listening socket. The default setup (CHAT_WEBSOCKET on) runs
+ONE worker, see below.
+
+    python -m app.commands.serve [--host 0.0.0.0] [--port 8000] [--workers N]
+
+The master upgrades the schema and creates the data directories, then
+starts the workers with DB_INIT_ON_STARTUP=0 so they only import the app.
+The master never imports app.main itself.
+
+The master always supervises its workers, also when there is only one,
+so the signals below work in every setup.
+
+Signals (to the master):
+    SIGHUP          restart the workers one at a time (graceful reload): the
+                    replacement is started and ready before the old one stops
+    SIGTTIN/SIGTTOU add / remove a worker (SIGTTIN is ignored while
+                    CHAT_WEBSOCKET is on)
+    SIGINT/SIGTERM  stop
+
+A stopping worker stops accepting connections, closes WebSockets with code
+1012 (service restart, clients reconnect, on a reload to the replacement
+worker) and waits up to GRACEFUL_SHUTDOWN_TIMEOUT seconds for open requests.
+
+The chat WebSocket keeps its connections, rooms, sender caches, heartbeats
+and pending read receipts in the worker's memory, with no fan-out between
+workers: while CHAT_WEBSOCKET is on, a single worker is started whatever
+--workers says. To scale the HTTP API, run it with CHAT_WEBSOCKET=0 and
+route /api/v1/chat/ws to a second, single-worker instance.
+
+Budgets are per worker, so N workers use N times: THREADPOOL_SIZE threads,
+ADMISSION_LIMITS and ADMISSION_QUEUES slots, IMAGE_WORKERS processes and
+database connections. Size them for the whole machine divided by N.
+"""
+import argparse
+import logging
+import os
+import time
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from app.core.config import settings
+
+logger = logging.getLogger("app.serve")
+
+
+def bootstrap() -> None:
+    """
+    Work that must happen exactly once per deploy, not once per worker.
+    """
+    from app.db.migrations import upgrade_schema
+    from app.db.repository import engine
+    from app.models import chat, friend, user, work  # noqa: F401  (register all tables)
+
+    started = time.perf_counter()
+    upgrade_schema(engine)
+    engine.dispose()
+    settings.IMAGE_DIR.mkdir(parents=True, exist_ok=True)
+    logger.info("Bootstrap done in %.0f ms", (time.perf_counter() - started) * 1000)
+
+
+def worker_count(requested: int) -> int:
+    workers = requested if requested > 0 else (os.cpu_count() or 1)
+    if workers > 1 and settings.CHAT_WEBSOCKET:
+        logger.warning("CHAT_WEBSOCKET is on, starting 1 worker instead of %d (chat state is per process)", workers)
+        return 1
+    return workers
+
+
+class Supervisor(Multiprocess):
+    """
+    uvicorn's worker supervisor, which uvicorn.run only uses for more than
+    one worker; never grows past one worker while the chat WebSocket is served.
+    """
+
+    def handle_ttin(self) -> None:
+        if settings.CHAT_WEBSOCKET:
+            logger.warning("Received SIGTTIN, ignored: CHAT_WEBSOCKET is on (chat state is per process)")
+            return
+        super().handle_ttin()
+
+
+def run(host: str, port: int, workers: int, log_level: str) -> None:
+    config = uvicorn.Config(
+        "app.main:app",
+        host=host,
+        port=port,
+        workers=workers,
+        timeout_graceful_shutdown=settings.GRACEFUL_SHUTDOWN_TIMEOUT,
+        log_level=log_level,
+        proxy_headers=True,
+        ws_per_message_deflate=settings.WS_PER_MESSAGE_DEFLATE,
+    )
+    Supervisor(config, sockets=[config.bind_socket()]).run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.WORKERS, help="0 = one per CPU core")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(levelname)s:     %(message)s")
+    bootstrap()
+
+    # Inherited by the (spawned) workers
+    os.environ["DB_INIT_ON_STARTUP"] = "0"
+    run(args.host, args.port, worker_count(args.workers), args.log_level)
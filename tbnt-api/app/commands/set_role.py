@@ -0,0 +1,30 @@
+"""
+Change a user's role level. Registration always assigns DEFAULT_ROLE_LEVEL,
+so admins (role_level <= ADMIN_ROLE_LEVEL) are appointed here.
+
+    python -m app.commands.set_role USERNAME LEVEL
+"""
+import argparse
+import sys
+
+from app.db.repository import SessionLocal
+from app.models import chat, friend, user, work  # noqa: F401  (register all mappers)
+from app.models.user import User
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("username")
+    parser.add_argument("level", type=int, help="lower is more privileged")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        account = db.query(User).filter(User.username == args.username).first()
+        if account is None:
+            sys.exit(f"No user named {args.username}")
+        previous, account.role_level = account.role_level, args.level
+        db.commit()
+    finally:
+        db.close()
+    print(f"{args.username}: role_level {previous} -> {args.level}")
@@ -0,0 +1,60 @@
+"""
+One-shot migration of uploads from the flat data/image layout into
+hash-prefix shard directories.
+
+    python -m app.commands.shard_images [--dry-run]
+
+Old /static/<name> URLs keep working, the static layer maps them to the
+shard. Safe to run repeatedly.
+"""
+import argparse
+import os
+
+from app.core import images
+from app.core.config import settings
+
+
+def migrate(dry_run: bool = False) -> int:
+    root = settings.IMAGE_DIR
+    moved = 0
+
+    # Originals (and their .gz/.br copies) in the top level directory
+    for entry in os.scandir(root):
+        if not entry.is_file() or entry.name.startswith("."):
+            continue
+        # Compressed copies follow their original into the same shard
+        original = entry.name
+        for suffix in (".gz", ".br"):
+            original = original.removesuffix(suffix)
+        target = root / images.shard_of(original) / entry.name
+        moved += _move(entry.path, target, dry_run)
+
+    # Variants rendered before sharding: variants/<variant>/<name>.webp
+    for variant in images.VARIANTS:
+        variant_dir = root / images.VARIANT_DIR / variant
+        if not variant_dir.is_dir():
+            continue
+        for entry in os.scandir(variant_dir):
+            if not entry.is_file() or not entry.name.endswith(images.VARIANT_EXT):
+                continue
+            original = entry.name[: -len(images.VARIANT_EXT)]
+            target = root / images.variant_name(images.sharded_name(original), variant)
+            moved += _move(entry.path, target, dry_run)
+
+    return moved
+
+
+def _move(source, target, dry_run: bool) -> int:
+    print(f"{source} -> {target}")
+    if not dry_run:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(source, target)
+    return 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dry-run", action="store_true", help="only print what would be moved")
+    args = parser.parse_args()
+    count = migrate(dry_run=args.dry_run)
+    print(f"{'Would move' if args.dry_run else 'Moved'} {count} files")
@@ -0,0 +1,175 @@
+"""
+Admission control for API requests.
+
+Every API request belongs to a route class with its own concurrency limit
+and bounded wait queue. A request that finds its queue full, or waits
+longer than ADMISSION_QUEUE_TIMEOUT, is answered 503 with Retry-After
+instead of piling up in front of the threadpool. Classes do not share
+slots, so a reconnect wave on /chat cannot starve logins or clock-outs
+(the "critical" class), and the sum of all limits stays within the
+threadpool size so admitted sync endpoints never wait for a thread.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict
+
+from anyio import to_thread
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+
+# First matching prefix (below the API prefix) wins
+ROUTE_CLASSES = (
+    ("/auth/login", "critical"),
+    ("/auth/register", "critical"),
+    ("/work/clock-out", "critical"),
+    ("/admin/metrics", "critical"),
+    ("/admin/export", "export"),
+    ("/chat/", "chat"),
+)
+DEFAULT_CLASS = "default"
+
+
+class Rejected(Exception):
+    pass
+
+
+class Limiter:
+    """
+    A FIFO semaphore with a bounded queue, for one route class.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int) -> None:
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Counters for metrics
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    async def acquire(self, timeout: float) -> None:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.queue_size:
+            self.rejected += 1
+            raise Rejected()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up: pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.timed_out += 1
+            raise Rejected()
+
+        waited = time.perf_counter() - started
+        self.admitted += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+
+    def release(self) -> None:
+        # Hand the slot straight to the next waiter, keeping `active` as is
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def metrics(self) -> dict:
+        waited = self.admitted or 1
+        return {
+            "limit": self.limit,
+            "queue_size": self.queue_size,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_wait_ms": round(self.wait_total / waited * 1000, 3),
+            "max_wait_ms": round(self.wait_max * 1000, 3),
+        }
+
+
+_limiters: Dict[str, Limiter] = {}
+
+
+def limiter_for(route_class: str) -> Limiter:
+    limiter = _limiters.get(route_class)
+    if limiter is None:
+        limits = settings.ADMISSION_LIMITS
+        limit = limits.get(route_class, limits[DEFAULT_CLASS])
+        queue = settings.ADMISSION_QUEUES.get(route_class, settings.ADMISSION_QUEUES[DEFAULT_CLASS])
+        limiter = _limiters[route_class] = Limiter(route_class, limit, queue)
+    return limiter
+
+
+def classify(path: str) -> str:
+    for prefix, route_class in ROUTE_CLASSES:
+        if path.startswith(prefix):
+            return route_class
+    return DEFAULT_CLASS
+
+
+def metrics() -> dict:
+    """
+    Per-class counters of this worker process, plus threadpool usage.
+    """
+    threadpool = to_thread.current_default_thread_limiter()
+    return {
+        "classes": {name: limiter.metrics() for name, limiter in sorted(_limiters.items())},
+        "threadpool": {"size": threadpool.total_tokens, "busy": threadpool.borrowed_tokens},
+    }
+
+
+async def _reject(send: Send) -> None:
+    body = b'{"detail":"Server is busy, please retry"}'
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(settings.ADMISSION_RETRY_AFTER).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    def __init__(self, app: ASGIApp, prefix: str) -> None:
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix) or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        limiter = limiter_for(classify(scope["path"][len(self.prefix):]))
+        try:
+            await limiter.acquire(settings.ADMISSION_QUEUE_TIMEOUT)
+        except Rejected:
+            await _reject(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
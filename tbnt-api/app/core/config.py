@@ -1,5 +1,10 @@
+from pathlib import Path
+from typing import Dict
 from pydantic_settings import BaseSettings
 
+# Project root directory (tbnt-api)
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
 class Settings(BaseSettings):
     PROJECT_NAME: str = "TBNT API"
     API_V1_STR: str = "/api/v1"
@@ -8,6 +13,51 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 24 hours
     
     SQLALCHEMY_DATABASE_URI: str = "sqlite:///./sql_app.db"
+    DB_INIT_ON_STARTUP: bool = True # Upgrade the schema on import; app.commands.serve does it once in the master instead
+
+    # Production server (python -m app.commands.serve)
+    # Every budget below (threads, admission limits and queues, image processes, DB pool) is per worker
+    WORKERS: int = 0 # Worker processes, 0 = one per CPU core; forced to 1 while CHAT_WEBSOCKET is on
+    CHAT_WEBSOCKET: bool = True # Serve /chat/ws; its connections, rooms and read receipts live in one process
+    GRACEFUL_SHUTDOWN_TIMEOUT: int = 30 # Seconds a stopping worker waits for open requests and WebSockets
+    WS_PING_INTERVAL: int = 25 # Seconds of silence before a WebSocket is pinged
+    WS_PING_TIMEOUT: int = 20 # Seconds after that without any frame before it is reaped
+    WS_SEND_TIMEOUT: float = 5.0 # A send that takes longer marks the socket dead
+    WS_MAX_ROOMS: int = 50 # Rooms one connection can subscribe to, besides the lobby
+    READ_RECEIPT_DELAY: float = 0.25 # Seconds to coalesce WebSocket read reports into one write
+    WS_PER_MESSAGE_DEFLATE: bool = True # Offer permessage-deflate compression (app.commands.serve)
+    THREADPOOL_SIZE: int = 40 # Threads for sync endpoints, per worker
+
+    # Admission control (app/core/admission.py), per worker. Keep the sum of the limits within THREADPOOL_SIZE
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_LIMITS: Dict[str, int] = {"critical": 4, "chat": 12, "export": 2, "default": 16} # Concurrent requests per route class
+    ADMISSION_QUEUES: Dict[str, int] = {"critical": 100, "chat": 50, "export": 2, "default": 100} # Waiting requests per route class
+    ADMISSION_QUEUE_TIMEOUT: float = 5.0 # Seconds a request may wait for a slot before 503
+    ADMISSION_RETRY_AFTER: int = 2 # Retry-After (seconds) sent with 503
+
+    ADMIN_ROLE_LEVEL: int = 1 # Users with role_level at or below this may use the admin endpoints
+    DEFAULT_ROLE_LEVEL: int = 5 # Role of registered users; change with python -m app.commands.set_role
+    EXPORT_CHUNK_SIZE: int = 1000 # Rows fetched and written per chunk of a streamed export
+
+    FRIEND_GRAPH_REFRESH: int = 5 # Seconds between checks for friendship changes made by other workers
+    SUGGESTIONS_REFRESH: int = 10 * 60 # Seconds between rebuilds of the friend suggestion index
+
+    GZIP_MIN_SIZE: int = 1024 # API responses smaller than this are sent uncompressed
+
+    # Sampling profiler (app/core/profiling.py)
+    PROFILE_SAMPLE_RATE: float = 0.0 # Fraction of requests / WebSocket messages profiled, 0 = only with an X-Profile token
+    PROFILE_INTERVAL: float = 0.002 # Seconds between stack samples
+    PROFILE_DIR: Path = BASE_DIR / "data" / "profiles"
+    PROFILE_MAX_FILES: int = 500 # Oldest profiles are deleted beyond this
+
+    # Uploaded images, served under /static
+    IMAGE_DIR: Path = BASE_DIR / "data" / "image"
+    IMAGE_WORKERS: int = 2 # Processes used to render image variants, per worker
+    IMAGE_FAILURE_TTL: int = 10 * 60 # Seconds a variant that failed to render answers 404 without a retry
+    IMAGE_GC_INTERVAL: int = 5 * 60 # Seconds between garbage collection steps, 0 disables
+    IMAGE_GC_SHARDS_PER_RUN: int = 4 # Shard directories scanned per step
+    IMAGE_GC_GRACE: int = 24 * 60 * 60 # Unreferenced files younger than this are kept
+    STATIC_MAX_AGE: int = 60 * 60 * 24 * 365 # Cache lifetime for immutable uploads (seconds)
 
     class Config:
         case_sensitive = True
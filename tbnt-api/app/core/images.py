@@ -0,0 +1,215 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+from typing import Dict, Iterable, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Uploads are spread over hash-prefix subdirectories: IMAGE_DIR/<ab>/<name>
+SHARD_CHARS = 2
+
+# Resized / recompressed variants of uploaded images.
+# Variant files live under IMAGE_DIR/variants/<variant>/<original name>.webp
+VARIANTS = {
+    "avatar": {"size": 64, "quality": 80},    # Avatars in lists and chat bubbles
+    "preview": {"size": 480, "quality": 80},  # Inline chat image previews
+    "webp": {"size": None, "quality": 85},    # Full size, recompressed
+}
+VARIANT_DIR = "variants"
+VARIANT_EXT = ".webp"
+
+AVATAR_VARIANTS = ("avatar", "webp")
+CHAT_VARIANTS = ("preview", "webp")
+
+_executor: Optional[ProcessPoolExecutor] = None
+_pending: Dict[str, Future] = {}
+_failed: Dict[str, float] = {}  # Variants whose rendering failed, until when not to retry
+_lock = Lock()
+
+
+def shard_of(filename: str) -> str:
+    return hashlib.sha1(filename.encode()).hexdigest()[:SHARD_CHARS]
+
+
+def sharded_name(filename: str) -> str:
+    """
+    Path of a file relative to IMAGE_DIR, e.g. 'ab/<uuid>.png'.
+    """
+    return f"{shard_of(filename)}/{filename}"
+
+
+def resolve_name(name: str) -> str:
+    """
+    Map legacy flat names ('<uuid>.png', as stored in old URLs) to their
+    sharded location. Sharded names are returned unchanged.
+    """
+    if "/" not in name:
+        return sharded_name(name)
+    return name
+
+
+def save_upload(fileobj, filename: Optional[str], default_ext: str = "") -> str:
+    """
+    Store an uploaded file under a unique name and return its path
+    relative to IMAGE_DIR.
+    """
+    file_ext = os.path.splitext(filename or "")[1] or default_ext
+    name = sharded_name(f"{uuid.uuid4()}{file_ext}")
+
+    path = settings.IMAGE_DIR / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as buffer:
+        shutil.copyfileobj(fileobj, buffer)
+    return name
+
+
+def image_url(name: str) -> str:
+    return f"/static/{name}"
+
+
+def variant_name(name: str, variant: str) -> str:
+    return f"{VARIANT_DIR}/{variant}/{name}{VARIANT_EXT}"
+
+
+def variant_urls(name: str, variants: Iterable[str]) -> Dict[str, str]:
+    return {variant: image_url(variant_name(name, variant)) for variant in variants}
+
+
+def parse_variant_name(path: str) -> Optional[tuple]:
+    """
+    Split a static path like 'variants/avatar/<name>.webp' into (name, variant).
+    Returns None if the path is not a known variant.
+    """
+    parts = path.replace("\\", "/").split("/", 2)
+    if len(parts) != 3 or parts[0] != VARIANT_DIR or parts[1] not in VARIANTS:
+        return None
+    if not parts[2].endswith(VARIANT_EXT):
+        return None
+    return parts[2][: -len(VARIANT_EXT)], parts[1]
+
+
+def render_variant(source: str, target: str, variant: str) -> str:
+    """
+    Render one variant of an image. Runs inside a worker process.
+    """
+    from PIL import Image, ImageOps
+
+    options = VARIANTS[variant]
+    with Image.open(source) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+        if options["size"]:
+            img.thumbnail((options["size"], options["size"]))
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Write to a temp file first so readers never see a partial image
+        tmp = f"{target}.{os.getpid()}.tmp"
+        img.save(tmp, "WEBP", quality=options["quality"], method=4)
+    os.replace(tmp, target)
+    return target
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def _reset_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _forget(key: str, future: Future) -> None:
+    failed = not future.cancelled() and future.exception() is not None
+    with _lock:
+        if _pending.get(key) is future:
+            del _pending[key]
+        if failed:
+            # Not an image (or too big to decode): don't resubmit on every request
+            _failed[key] = time.monotonic() + settings.IMAGE_FAILURE_TTL
+    if failed:
+        logger.warning("Failed to render image variant %s: %s", key, future.exception())
+
+
+def _recently_failed(key: str) -> bool:
+    """
+    Check the negative cache. Call with _lock held.
+    """
+    until = _failed.get(key)
+    if until is None:
+        return False
+    if time.monotonic() < until:
+        return True
+    del _failed[key]
+    return False
+
+
+def submit_variant(name: str, variant: str) -> Optional[Future]:
+    """
+    Queue rendering of a variant in the process pool.
+    Returns None if the source image does not exist or rendering it failed
+    less than IMAGE_FAILURE_TTL seconds ago. Concurrent requests for the
+    same variant share one future. Touches the filesystem: call it from a
+    thread, not the event loop.
+    """
+    root = settings.IMAGE_DIR.resolve()
+    source = (root / name).resolve()
+    target = root / variant_name(name, variant)
+    # Only originals inside the image directory can have variants
+    if not source.is_relative_to(root) or source.relative_to(root).parts[0] == VARIANT_DIR:
+        return None
+    if not source.is_file():
+        # Not moved into its shard yet (see app/commands/shard_images.py)
+        source = root / os.path.basename(name)
+        if not source.is_file():
+            return None
+
+    key = str(target)
+    created = False
+    with _lock:
+        if _recently_failed(key):
+            return None
+        future = _pending.get(key)
+        if future is None:
+            try:
+                future = _get_executor().submit(render_variant, str(source), key, variant)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM on a huge image); start a fresh pool
+                _reset_executor()
+                future = _get_executor().submit(render_variant, str(source), key, variant)
+            _pending[key] = future
+            created = True
+    if created:
+        future.add_done_callback(lambda f: _forget(key, f))
+    return future
+
+
+def schedule_variants(name: str, variants: Iterable[str]) -> None:
+    """
+    Render variants in the background right after upload.
+    """
+    for variant in variants:
+        if not (settings.IMAGE_DIR / variant_name(name, variant)).is_file():
+            submit_variant(name, variant)
+
+
+def shutdown() -> None:
+    with _lock:
+        _reset_executor()
@@ -0,0 +1,314 @@
+"""
+Opt-in statistical profiling of requests and WebSocket messages.
+
+A request is profiled when it is picked by PROFILE_SAMPLE_RATE or carries
+a valid X-Profile token (see make_token). While it runs, a background
+thread samples the stacks of all busy threads every PROFILE_INTERVAL
+seconds, which covers both the event loop and the threadpool running sync
+endpoints. The collapsed stacks are written with route and latency
+metadata to PROFILE_DIR, keeping at most PROFILE_MAX_FILES files, and
+app/commands/profiles.py merges them for flame graphs.
+
+Samples are process-wide: the event loop is shared by all requests, so a
+profile also contains whatever ran concurrently. Each stack is rooted at
+its thread's name and every profile records "concurrent", the most
+requests / WebSocket messages in flight while it ran; profiles with
+concurrent == 1 are attributable to their route alone (profiles collapse
+--solo). Stopping the sampler and writing the file happen in a worker
+thread, never on the event loop.
+
+Requests that are not sampled cost one header lookup, one random() and a
+counter update.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional
+
+from anyio import to_thread
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import BASE_DIR, settings
+
+logger = logging.getLogger(__name__)
+
+HEADER = "x-profile"
+
+# Leaf frames of threads that are waiting rather than working
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+}
+
+_active = threading.Lock()  # One profile at a time per process
+_labels: Dict[object, str] = {}
+
+# Requests and WebSocket messages being handled, and the most seen during
+# the running profile. Only changed on the event loop
+_in_flight = 0
+_peak = 0
+
+
+def _enter() -> None:
+    global _in_flight, _peak
+    _in_flight += 1
+    _peak = max(_peak, _in_flight)
+
+
+def _leave() -> None:
+    global _in_flight
+    _in_flight -= 1
+
+
+def _label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        if filename.startswith(str(BASE_DIR)):
+            filename = os.path.relpath(filename, BASE_DIR)
+        elif "site-packages" in filename:
+            filename = filename.split("site-packages" + os.sep, 1)[1]
+        else:
+            filename = os.path.basename(filename)
+        label = _labels[code] = f"{filename}:{code.co_name}"
+    return label
+
+
+def collapse(frame) -> Optional[str]:
+    """
+    A thread's stack as "root;...;leaf", or None if the thread is idle.
+    """
+    code = frame.f_code
+    if (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES:
+        return None
+    labels = []
+    while frame is not None:
+        labels.append(_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def thread_label(name: str) -> str:
+    # "asyncio_3", "Thread-7 (worker)" and "asyncio-portal-7f3d36" group with their siblings
+    return re.sub(r"[-_ ]?[0-9a-f]*\d[0-9a-f]*( \(.*\))?$", "", name) or name
+
+
+class Sampler(threading.Thread):
+    def __init__(self, interval: float) -> None:
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop_event = threading.Event()
+        self._threads: Dict[int, str] = {}
+
+    def _thread(self, thread_id: int) -> str:
+        label = self._threads.get(thread_id)
+        if label is None:
+            self._threads = {thread.ident: thread_label(thread.name) for thread in threading.enumerate()}
+            label = self._threads.get(thread_id, "thread")
+        return label
+
+    def run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = collapse(frame)
+                if stack:
+                    self.samples[f"{self._thread(thread_id)};{stack}"] += 1
+
+    def stop(self) -> Counter:
+        self._stop_event.set()
+        self.join()
+        return self.samples
+
+
+# --- Debug tokens ---
+
+def make_token(ttl: int = 3600) -> str:
+    """
+    A token for the X-Profile header, valid for `ttl` seconds.
+    """
+    expires = str(int(time.time()) + ttl)
+    return f"{expires}.{_sign(expires)}"
+
+
+def _sign(value: str) -> str:
+    return hmac.new(settings.SECRET_KEY.encode(), f"profile:{value}".encode(), hashlib.sha256).hexdigest()
+
+
+def valid_token(token: Optional[str]) -> bool:
+    if not token or "." not in token:
+        return False
+    expires, signature = token.split(".", 1)
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(signature, _sign(expires))
+
+
+# --- Storage ---
+
+def _slug(route: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_")[:60] or "root"
+
+
+def save(route: str, kind: str, latency: float, samples: Counter, **meta) -> Optional[Path]:
+    if not samples:
+        return None
+    directory = settings.PROFILE_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    started = time.time()
+    path = directory / f"{int(started * 1000)}-{os.getpid()}-{_slug(route)}.json"
+    profile = {
+        "route": route,
+        "kind": kind,
+        "latency_ms": round(latency * 1000, 3),
+        "interval_ms": settings.PROFILE_INTERVAL * 1000,
+        "recorded_at": started,
+        "pid": os.getpid(),
+        **meta,
+        "samples": dict(samples),
+    }
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(profile))
+    os.replace(tmp, path)
+    _rotate(directory)
+    return path
+
+
+def _rotate(directory: Path) -> None:
+    files = sorted(entry.path for entry in os.scandir(directory) if entry.name.endswith(".json"))
+    for old in files[:max(0, len(files) - settings.PROFILE_MAX_FILES)]:
+        try:
+            os.unlink(old)
+        except FileNotFoundError:
+            pass
+
+
+def route_template(scope: Scope) -> str:
+    """
+    The request path with path parameters put back as {name}, so profiles
+    of /friends/12 and /friends/13 group together.
+    """
+    segments = scope["path"].split("/")
+    for name, value in (scope.get("path_params") or {}).items():
+        value = str(value)
+        if value in segments:
+            segments[segments.index(value)] = "{" + name + "}"
+    return "/".join(segments)
+
+
+def should_sample(token: Optional[str] = None) -> bool:
+    if token is not None and valid_token(token):
+        return True
+    rate = settings.PROFILE_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+def _finish(sampler: Sampler, route: str, kind: str, latency: float, meta: dict) -> None:
+    """
+    Stop the sampler and store its profile; runs in a worker thread.
+    """
+    try:
+        samples = sampler.stop()
+    finally:
+        _active.release()
+    try:
+        save(route, kind, latency, samples, **meta)
+    except OSError:
+        logger.exception("Could not write profile for %s", route)
+
+
+@asynccontextmanager
+async def profile(route: str, kind: str, **meta) -> AsyncIterator[dict]:
+    """
+    Sample the enclosed block; skipped if another profile is running.
+    Callers can add metadata to the yielded dict, including a more precise
+    "route" once it is known.
+    """
+    global _peak
+    if not _active.acquire(blocking=False):
+        yield meta
+        return
+    sampler = Sampler(settings.PROFILE_INTERVAL)
+    _peak = _in_flight
+    started = time.perf_counter()
+    sampler.start()
+    try:
+        yield meta
+    finally:
+        latency = time.perf_counter() - started
+        meta["scope"] = "process"
+        meta["concurrent"] = _peak
+        await to_thread.run_sync(_finish, sampler, meta.pop("route", route), kind, latency, meta)
+
+
+@asynccontextmanager
+async def maybe_profile(route: str, kind: str, token: Optional[str] = None, **meta) -> AsyncIterator[Optional[dict]]:
+    """
+    profile() for sampled work, a no-op otherwise.
+    """
+    _enter()
+    try:
+        if not should_sample(token):
+            yield None
+        else:
+            async with profile(route, kind, **meta) as info:
+                yield info
+    finally:
+        _leave()
+
+
+class ProfilingMiddleware:
+    """
+    Profiles sampled HTTP requests (WebSocket messages are profiled by the
+    endpoint, per message).
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        _enter()
+        try:
+            await self._call(scope, receive, send)
+        finally:
+            _leave()
+
+    async def _call(self, scope: Scope, receive: Receive, send: Send) -> None:
+        token = Headers(scope=scope).get(HEADER)
+        if not should_sample(token):
+            await self.app(scope, receive, send)
+            return
+
+        status = {}
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        async with profile(scope["path"], "http", method=scope["method"]) as meta:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                # Path parameters are known after routing, e.g. /api/v1/friends/{friendship_id}
+                meta["route"] = route_template(scope)
+                meta["endpoint"] = getattr(scope.get("endpoint"), "__name__", None)
+                meta["status"] = status.get("code")
@@ -0,0 +1,169 @@
+import asyncio
+import mimetypes
+import os
+import re
+import stat
+from typing import Dict, Optional, Tuple
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+from starlette.types import Scope
+
+from app.core import images
+from app.core.config import settings
+
+# Uploads are stored under random UUID names and never rewritten, and
+# variants are derived from them, so both can be cached forever.
+IMMUTABLE_NAME = re.compile(
+    r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}(\.[A-Za-z0-9]+)*$"
+)
+
+# Pre-generated compressed copies (<file>.br / <file>.gz), in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# (encoding, path, stat_result) of a pre-compressed copy
+Encoded = Tuple[str, str, os.stat_result]
+
+
+def accepted_encodings(header: str) -> Dict[str, float]:
+    """
+    Content codings of an Accept-Encoding header with their q-values.
+    """
+    qualities = {}
+    for part in header.split(","):
+        coding, *params = part.split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def accepts(qualities: Dict[str, float], coding: str) -> bool:
+    return qualities.get(coding, qualities.get("*", 0.0)) > 0
+
+
+class ImageStaticFiles(StaticFiles):
+    """
+    StaticFiles for uploaded images.
+
+    Files are stored in hash-prefix shards; legacy flat URLs are mapped to
+    their shard. Variant paths (variants/<variant>/<name>.webp) that have
+    not been rendered yet are generated on first request and cached on disk.
+    Content-addressed files are served with immutable Cache-Control and
+    name-based strong ETags; pre-compressed copies are used when the
+    client accepts them (q > 0), except for Range requests, which get
+    slices of the identity file from FileResponse.
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        parsed = images.parse_variant_name(path)
+        if parsed is not None:
+            # Old URLs reference flat names; files now live in shards
+            parsed = images.resolve_name(parsed[0]), parsed[1]
+            path = images.variant_name(*parsed)
+        elif "/" not in path and path != ".":
+            sharded = images.resolve_name(path)
+            full_path, stat_result = await asyncio.to_thread(self.lookup_path, sharded)
+            # Files not migrated yet are still served from the flat layout
+            if stat_result is not None:
+                path = sharded
+
+        if parsed is not None:
+            full_path, stat_result = await asyncio.to_thread(self.lookup_path, path)
+            if stat_result is None:
+                name, variant = parsed
+                future = await asyncio.to_thread(images.submit_variant, name, variant)
+                if future is not None:
+                    try:
+                        await asyncio.wrap_future(future)
+                    except Exception:
+                        # Not a decodable image; fall through to 404
+                        pass
+
+        request_headers = Headers(scope=scope)
+        qualities = accepted_encodings(request_headers.get("accept-encoding", ""))
+        if qualities and "range" not in request_headers and scope["method"] in ("GET", "HEAD"):
+            # All stat calls in the threadpool, as StaticFiles does for the file itself
+            found = await asyncio.to_thread(self.lookup_with_encoded, path, qualities)
+            if found is not None:
+                full_path, stat_result, encoded = found
+                return self.file_response(full_path, stat_result, scope, encoded=encoded)
+        return await super().get_response(path, scope)
+
+    def lookup_with_encoded(
+        self, path: str, qualities: Dict[str, float]
+    ) -> Optional[Tuple[str, os.stat_result, Optional[Encoded]]]:
+        """
+        The file and its preferred accepted pre-compressed copy, if any.
+        None when the path is not a regular file; StaticFiles then answers
+        (404, 401, ...).
+        """
+        try:
+            full_path, stat_result = self.lookup_path(path)
+            if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+                return None
+            for encoding, suffix in ENCODINGS:
+                if not accepts(qualities, encoding):
+                    continue
+                candidate, candidate_stat = self.lookup_path(f"{path}{suffix}")
+                if candidate_stat is not None and stat.S_ISREG(candidate_stat.st_mode):
+                    return full_path, stat_result, (encoding, candidate, candidate_stat)
+        except (OSError, ValueError):
+            return None
+        return full_path, stat_result, None
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+        encoded: Optional[Encoded] = None,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        filename = os.path.basename(full_path)
+        immutable = IMMUTABLE_NAME.match(filename) is not None
+
+        headers = {"vary": "Accept-Encoding"}
+        if immutable:
+            headers["cache-control"] = f"public, max-age={settings.STATIC_MAX_AGE}, immutable"
+        else:
+            headers["cache-control"] = "no-cache"
+
+        media_type = None
+        encoding = None
+        if status_code == 200 and encoded is not None:
+            encoding, full_path, stat_result = encoded
+            headers["content-encoding"] = encoding
+            # Keep the content type of the original file
+            media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+        if immutable:
+            # The name identifies the content, so the tag is stable across
+            # hosts and copies (mtime is not).
+            tag = f"{filename}-{stat_result.st_size:x}"
+            if encoding:
+                tag = f"{tag}-{encoding}"
+            headers["etag"] = f'"{tag}"'
+
+        response = FileResponse(
+            full_path,
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type,
+            stat_result=stat_result,
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,81 @@
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn
+
+from app.db.repository import Base
+
+logger = logging.getLogger(__name__)
+
+# Highest id a rebuilt AUTOINCREMENT table must never hand out again, beyond
+# its current rows (see _enable_autoincrement)
+ID_FLOORS = {
+    "work_items": "SELECT MAX(item_id) FROM work_item_tombstones",
+}
+
+
+def upgrade_schema(engine: Engine) -> None:
+    """
+    Bring an existing database up to date with the models.
+
+    create_all() only creates missing tables, so columns and indexes added
+    to existing models are applied here. Both steps are idempotent.
+    """
+    Base.metadata.create_all(bind=engine)
+
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                logger.info("Adding column %s.%s", table.name, column.name)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+
+    if engine.dialect.name == "sqlite":
+        for table in Base.metadata.sorted_tables:
+            if table.dialect_options["sqlite"]["autoincrement"]:
+                _enable_autoincrement(engine, table)
+
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except Exception as e:
+                logger.warning("Could not create index %s: %s", index.name, e)
+
+
+def _enable_autoincrement(engine: Engine, table) -> None:
+    """
+    SQLite cannot add AUTOINCREMENT to an existing table, so a table created
+    without it is rebuilt: renamed, created anew (with its indexes), filled
+    from the old rows and dropped. The id sequence starts above ID_FLOORS.
+    """
+    with engine.begin() as conn:
+        sql = conn.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table.name}
+        ).scalar()
+        if sql is None or "AUTOINCREMENT" in sql.upper():
+            return
+        logger.info("Rebuilding %s with AUTOINCREMENT ids", table.name)
+        old = f"_{table.name}_old"
+        conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {old}"))
+        # The indexes moved to the renamed table but keep their names
+        for index in table.indexes:
+            conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        table.create(bind=conn)
+        columns = ", ".join(column.name for column in table.columns)
+        conn.execute(text(f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {old}"))
+        conn.execute(text(f"DROP TABLE {old}"))
+
+        floor = conn.execute(text(ID_FLOORS[table.name])).scalar() if table.name in ID_FLOORS else None
+        if floor:
+            seq = conn.execute(text("SELECT seq FROM sqlite_sequence WHERE name = :name"), {"name": table.name}).scalar()
+            conn.execute(text("DELETE FROM sqlite_sequence WHERE name = :name"), {"name": table.name})
+            conn.execute(
+                text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"),
+                {"name": table.name, "seq": max(seq or 0, floor)},
+            )
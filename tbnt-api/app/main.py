@@ -1,26 +1,66 @@
-from pathlib import Path
+import asyncio
+from contextlib import asynccontextmanager
+from anyio import to_thread
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
 from app.api.api import api_router
+from app.api.caching import APIGZipMiddleware
+from app.core import images
+from app.core.admission import AdmissionMiddleware
 from app.core.config import settings
-from app.db.repository import Base, engine
+from app.core.profiling import ProfilingMiddleware
+from app.core.static import ImageStaticFiles
+from app.db.migrations import upgrade_schema
+from app.db.repository import SessionLocal, engine
+from app.services import friend_graph, image_gc
+from app.services.connections import manager
+from app.services.read_receipts import receipts
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Create tables and apply new columns / indexes (done once by the master under app.commands.serve)
+if settings.DB_INIT_ON_STARTUP:
+    upgrade_schema(engine)
 
-app = FastAPI(title=settings.PROJECT_NAME)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the in-memory friendship index before serving requests
+    db = SessionLocal()
+    try:
+        friend_graph.graph.load(db)
+    finally:
+        db.close()
+
+    # Thread pool for sync endpoints; admission limits keep its queue short
+    to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+
+    tasks = []
+    if settings.IMAGE_GC_INTERVAL > 0:
+        tasks.append(asyncio.create_task(image_gc.run_periodically()))
+    yield
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await manager.stop()
+    # Write read receipts still waiting for their batch
+    await receipts.flush()
+    # Stop image variant workers
+    images.shutdown()
+
+app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
 
 # Mount static files
-# Get the project root directory (tbnt-api)
-BASE_DIR = Path(__file__).resolve().parent.parent
-STATIC_DIR = BASE_DIR / "data" / "image"
+STATIC_DIR = settings.IMAGE_DIR
 
 # Ensure directory exists
 STATIC_DIR.mkdir(parents=True, exist_ok=True)
 
-app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
+# Serves uploads and lazily renders their resized variants
+app.mount("/static", ImageStaticFiles(directory=str(STATIC_DIR)), name="static")
+
+# Per route class concurrency limits, 503 + Retry-After when a class is saturated.
+# Added before CORS so rejections still carry CORS headers
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware, prefix=settings.API_V1_STR)
 
 # Set all CORS enabled origins
 app.add_middleware(
@@ -31,6 +71,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger API responses (list endpoints)
+app.add_middleware(APIGZipMiddleware, prefix=settings.API_V1_STR, minimum_size=settings.GZIP_MIN_SIZE, compresslevel=6)
+
+# Sampled / token-requested request profiles (outermost, so it sees the whole request)
+app.add_middleware(ProfilingMiddleware)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 @app.get("/")
@@ -1,7 +1,19 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from app.db.repository import Base
 
+class ChatRoom(Base):
+    """
+    A public channel. The lobby is not a row: its messages have no room_id.
+    """
+    __tablename__ = "chat_rooms"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, nullable=False)
+    description = Column(String, nullable=True)
+    created_by = Column(Integer, ForeignKey("users.id"))
+    created_at = Column(String) # Format: YYYY-MM-DD HH:MM:SS
+
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
 
@@ -11,9 +23,26 @@ class ChatMessage(Base):
     message_type = Column(String, default="text") # text, image
     created_at = Column(String) # Format: YYYY-MM-DD HH:MM:SS
     
+    # For room messages, NULL for the lobby and private chat
+    room_id = Column(Integer, ForeignKey("chat_rooms.id"), nullable=True)
+
     # For private chat
     to_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     is_read = Column(Boolean, default=False)
 
     sender = relationship("User", foreign_keys=[user_id], backref="sent_messages")
     receiver = relationship("User", foreign_keys=[to_user_id], backref="received_messages")
+
+    __table_args__ = (
+        # Private conversations: latest message per pair, unread counts
+        Index("ix_chat_messages_pair", "user_id", "to_user_id", "id"),
+        Index("ix_chat_messages_inbox", "to_user_id", "is_read", "user_id"),
+        # Lobby and room history, newest first (lobby: both NULL)
+        Index("ix_chat_messages_room", "room_id", "to_user_id", "id"),
+        # Image URLs only, used by the image garbage collector
+        Index(
+            "ix_chat_messages_image_content", "content",
+            sqlite_where=message_type == "image",
+            postgresql_where=message_type == "image",
+        ),
+    )
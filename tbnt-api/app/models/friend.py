@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from datetime import datetime
 from app.db.repository import Base
 
 class Friendship(Base):
@@ -11,7 +12,13 @@ class Friendship(Base):
     friend_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     status = Column(Integer, default=0) # 0: Pending, 1: Accepted, 2: Rejected
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     requester = relationship("User", foreign_keys=[user_id], backref="sent_requests")
     target = relationship("User", foreign_keys=[friend_id], backref="received_requests")
+
+    __table_args__ = (
+        Index("ix_friendships_user_status", "user_id", "status"),
+        Index("ix_friendships_friend_status", "friend_id", "status"),
+    )
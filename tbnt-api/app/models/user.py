@@ -1,4 +1,5 @@
-from sqlalchemy import Boolean, Column, Integer, String
+from datetime import datetime
+from sqlalchemy import Boolean, Column, Integer, String, DateTime
 from app.db.repository import Base
 
 class User(Base):
@@ -15,3 +16,4 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     chat_color = Column(String, default="#3b82f6") # Default blue, but should be random on creation
     number = Column(Integer, unique=True, index=True) # 6-digit unique ID
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True) # Profile version for cached lists
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Date, Index
 from sqlalchemy.orm import relationship
 from app.db.repository import Base
 from datetime import datetime
@@ -24,10 +24,50 @@ class WorkItem(Base):
     status = Column(String, default="pending") # 'pending', 'done'
     percentage = Column(Integer, default=0) # For 'progress' type
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = Column(Integer, nullable=True) # WorkSync.version of the last change
 
     # Relationship
     user = relationship("User", backref="work_items")
 
+    __table_args__ = (
+        # Paginated, newest first listing per type, and of all types
+        Index("ix_work_items_user_type_created", "user_id", "type", "created_at"),
+        Index("ix_work_items_user_created", "user_id", "created_at", "id"),
+        # Delta sync: items changed since a version
+        Index("ix_work_items_user_version", "user_id", "version"),
+        # Never reuse the id of a deleted item: delta syncs would report it
+        # as both changed and deleted
+        {"sqlite_autoincrement": True},
+    )
+
+class WorkItemTombstone(Base):
+    """
+    A deleted work item, kept so delta syncs can report the deletion.
+    """
+    __tablename__ = "work_item_tombstones"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    item_id = Column(Integer, nullable=False)
+    version = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_work_item_tombstones_user_version", "user_id", "version"),
+    )
+
+class WorkSync(Base):
+    """
+    Per-user change counter for work items. Every committed change (or
+    batch of changes) increments it, and clients sync with the last
+    version they have seen.
+    """
+    __tablename__ = "work_sync"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
 class WorkRecord(Base):
     __tablename__ = "work_records"
 
@@ -39,3 +79,28 @@ class WorkRecord(Base):
     
     # Relationship
     user = relationship("User", backref="work_records")
+
+    __table_args__ = (
+        # Paginated history and date ranges
+        Index("ix_work_records_user_date", "user_id", "date"),
+    )
+
+class WorkDay(Base):
+    """
+    Numeric rollup of one WorkRecord, kept in sync by clock-out (and
+    app/commands/backfill_work_days.py for history) so statistics never
+    parse the string columns of work_records.
+    """
+    __tablename__ = "work_days"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    date = Column(Date, nullable=False)
+    record_id = Column(Integer, ForeignKey("work_records.id"))
+    seconds = Column(Integer, default=0)          # clock_out - clock_in
+    overtime_seconds = Column(Integer, default=0) # clock_out - WorkSettings.end_time, if positive
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_work_days_user_date", "user_id", "date", unique=True),
+    )
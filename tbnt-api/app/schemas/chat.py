@@ -1,6 +1,7 @@
 from typing import Optional, List
 from pydantic import BaseModel
 from app.api.models.user import User
+from app.schemas.friend import Friendship
 
 class ChatMessageBase(BaseModel):
     content: str
@@ -12,9 +13,41 @@ class ChatMessageCreate(ChatMessageBase):
 class ChatMessage(ChatMessageBase):
     id: int
     user_id: int
+    room_id: Optional[int] = None
+    is_read: Optional[bool] = None # Private messages: read by the receiver
     created_at: str
     message_type: str
     sender: Optional[User] = None
 
     class Config:
         from_attributes = True
+
+class ChatRoomCreate(BaseModel):
+    name: str
+    description: Optional[str] = None
+
+class ChatRoom(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    created_by: Optional[int] = None
+    created_at: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class LastMessage(BaseModel):
+    id: int
+    user_id: int
+    content: str
+    message_type: str
+    created_at: str
+
+# An accepted friendship with its private chat summary
+class Conversation(Friendship):
+    unread_count: int = 0
+    last_message: Optional[LastMessage] = None
+
+class ConversationPage(BaseModel):
+    items: List[Conversation]
+    next_cursor: Optional[str] = None # Pass back as `cursor` to get the next page
@@ -1,7 +1,7 @@
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
-from app.api.models.user import User
+from app.api.models.user import PublicUser, User
 
 class FriendshipBase(BaseModel):
     pass
@@ -22,3 +22,12 @@ class Friendship(FriendshipBase):
 
     class Config:
         from_attributes = True
+
+class FriendSuggestion(BaseModel):
+    user: PublicUser # Not a friend: no phone
+    mutual_count: int
+
+class MutualFriends(BaseModel):
+    user_id: int
+    mutual_count: int
+    mutual_friends: List[User] # Up to `limit` of them
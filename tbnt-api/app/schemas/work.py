@@ -1,6 +1,6 @@
-from pydantic import BaseModel
-from typing import Optional, List
-from datetime import datetime
+from pydantic import BaseModel, model_validator
+from typing import Literal, Optional, List
+from datetime import date, datetime
 
 # Work Settings Schemas
 class WorkSettingsBase(BaseModel):
@@ -43,6 +43,44 @@ class WorkItem(WorkItemBase):
     class Config:
         from_attributes = True
 
+class WorkItemOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    id: Optional[int] = None         # Item to update or delete
+    client_id: Optional[str] = None  # Echoed back so clients can match created items
+    type: Optional[str] = None       # Required for create
+    content: Optional[str] = None    # Required for create
+    status: Optional[str] = None
+    percentage: Optional[int] = None
+
+    @model_validator(mode="after")
+    def check_id(self) -> "WorkItemOperation":
+        if self.op != "create" and self.id is None:
+            raise ValueError(f"{self.op} needs the id of the item")
+        return self
+
+class WorkItemBatch(BaseModel):
+    operations: List[WorkItemOperation]
+
+class WorkItemOperationResult(BaseModel):
+    op: str
+    id: int
+    client_id: Optional[str] = None
+    item: Optional[WorkItem] = None # None for deletes
+
+class WorkItemBatchResult(BaseModel):
+    version: int
+    results: List[WorkItemOperationResult]
+
+class WorkItemChanges(BaseModel):
+    version: int # Pass back as `since` on the next sync
+    full: bool   # True if `items` is the complete list (replace, don't merge)
+    items: List[WorkItem]
+    deleted: List[int]
+
+class WorkItemPage(BaseModel):
+    items: List[WorkItem]
+    next_cursor: Optional[str] = None # Pass back as `cursor` to get the next page
+
 # Work Record Schemas
 class WorkRecordBase(BaseModel):
     date: str
@@ -58,3 +96,25 @@ class WorkRecord(WorkRecordBase):
 
     class Config:
         from_attributes = True
+
+class WorkRecordPage(BaseModel):
+    items: List[WorkRecord]
+    next_cursor: Optional[str] = None # Pass back as `cursor` to get the next page
+
+# Work Statistics Schemas
+class WorkStatsPeriod(BaseModel):
+    start: date # First day of the day/week/month
+    days: int
+    seconds: int
+    overtime_seconds: int
+
+class WorkStats(BaseModel):
+    period: str # 'day', 'week', 'month'
+    start: date
+    end: date
+    days: int
+    seconds: int
+    overtime_seconds: int
+    current_streak: int # Consecutive working days, weekends skipped
+    longest_streak: int
+    periods: List[WorkStatsPeriod]
@@ -0,0 +1,139 @@
+"""
+Wire formats of the chat WebSocket, negotiated per connection through the
+Sec-WebSocket-Protocol header (first supported entry of the client's list).
+
+    (none)            JSON text frames, every message embeds its full sender
+    tbnt.compact.v1   JSON text frames without "sender": a
+                      {"type": "user", "user": {...}} frame announces each
+                      sender once per connection (again if the profile
+                      changes) and messages refer to it by user_id
+    tbnt.msgpack.v1   as tbnt.compact.v1, MessagePack binary frames; the
+                      client may send MessagePack or JSON
+
+permessage-deflate is negotiated by the server (uvicorn) independently of
+these, see WS_PER_MESSAGE_DEFLATE. With it all three come to about the same
+bytes per message (benchmarks/bench_ws_protocol.py); the compact formats
+only pay off on connections without deflate.
+"""
+import json
+from typing import Any, Dict, Iterable, Optional, Union
+
+from pydantic_core import to_json
+
+JSON = "json"  # No subprotocol requested
+COMPACT = "tbnt.compact.v1"
+MSGPACK = "tbnt.msgpack.v1"
+SUBPROTOCOLS = (MSGPACK, COMPACT)
+
+Frame = Union[str, bytes]
+
+_msgpack = None
+
+
+def _packer():
+    # Imported on first use so JSON-only workers never load it
+    global _msgpack
+    if _msgpack is None:
+        import msgpack
+        _msgpack = msgpack
+    return _msgpack
+
+
+def negotiate(offered: Iterable[str]) -> str:
+    for subprotocol in offered:
+        if subprotocol.strip() in SUBPROTOCOLS:
+            return subprotocol.strip()
+    return JSON
+
+
+def subprotocol_header(protocol: str) -> Optional[str]:
+    """
+    The value to accept() with; None for plain JSON.
+    """
+    return None if protocol == JSON else protocol
+
+
+def is_compact(protocol: str) -> bool:
+    return protocol != JSON
+
+
+def encode(protocol: str, frame: Dict[str, Any]) -> Frame:
+    if protocol == MSGPACK:
+        return _packer().packb(frame, use_bin_type=True)
+    return to_json(frame).decode()
+
+
+class FrameError(ValueError):
+    """
+    A received frame that cannot be handled; the detail is sent back in an
+    error frame and the connection stays open.
+    """
+
+
+# Fields that must be integers (or null) when present
+ID_FIELDS = ("to_user_id", "room_id", "friend_id", "message_id")
+# Fields that must be strings (or null) when present
+TEXT_FIELDS = ("type", "content")
+
+
+def parse(data: Frame) -> Dict[str, Any]:
+    """
+    A received frame as a dict: text is JSON, binary is MessagePack. Text
+    that is not JSON is a plain lobby message, as sent by old clients.
+    """
+    if isinstance(data, bytes):
+        try:
+            frame = _packer().unpackb(data, raw=False)
+        except Exception:
+            raise FrameError("Invalid message")
+    else:
+        try:
+            frame = json.loads(data)
+        except json.JSONDecodeError:
+            return {"type": "text", "content": data}
+
+    if not isinstance(frame, dict):
+        raise FrameError("Message must be an object")
+    for key in ID_FIELDS:
+        value = frame.get(key)
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool)):
+            raise FrameError(f"{key} must be an integer")
+    for key in TEXT_FIELDS:
+        value = frame.get(key)
+        if value is not None and not isinstance(value, str):
+            raise FrameError(f"{key} must be a string")
+    return frame
+
+
+def strip_sender(message: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in message.items() if key != "sender"}
+
+
+def user_frame(sender: Dict[str, Any]) -> Dict[str, Any]:
+    return {"type": "user", "user": sender}
+
+
+class MessageFrames:
+    """
+    The frames of one chat message, encoded on first use per format and
+    then shared by every socket using that format.
+    """
+
+    def __init__(self, message: Dict[str, Any]) -> None:
+        self.sender: Optional[Dict[str, Any]] = message.get("sender") or None
+        self._message = message
+        self._messages: Dict[str, Frame] = {}
+        self._users: Dict[str, Frame] = {}
+
+    def message(self, protocol: str) -> Frame:
+        frame = self._messages.get(protocol)
+        if frame is None:
+            body = strip_sender(self._message) if is_compact(protocol) and self.sender else self._message
+            frame = self._messages[protocol] = encode(protocol, body)
+        return frame
+
+    def user(self, protocol: str) -> Frame:
+        frame = self._users.get(protocol)
+        if frame is None:
+            frame = self._users[protocol] = encode(protocol, user_frame(self.sender))
+        return frame
@@ -0,0 +1,232 @@
+"""
+Registry of open chat WebSockets.
+
+Every frame received from a client marks its connection as alive. A single
+heartbeat task per process pings connections that have been quiet for
+WS_PING_INTERVAL seconds and reaps those that stay silent for another
+WS_PING_TIMEOUT (half-open TCP connections never report a disconnect).
+Sends are bounded by WS_SEND_TIMEOUT and a failed send reaps the socket
+too, so broadcasts only go to live connections.
+
+Public messages are fanned out per room: each room keeps the set of its
+subscribed sockets, so a message costs O(room subscribers) rather than
+O(connections). Every connection starts subscribed to the lobby.
+
+Frames are encoded in the connection's negotiated format (see
+app/services/chat_protocol.py), once per format and broadcast rather than
+once per socket. The per-socket work of a broadcast is a dict lookup or
+two and the send itself.
+"""
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Dict, Optional, Set
+
+from fastapi import WebSocket
+
+from app.core.config import settings
+from app.services import chat_protocol
+
+logger = logging.getLogger(__name__)
+
+# Close code for reaped connections (RFC 6455 "going away"); clients reconnect
+REAPED_CLOSE_CODE = 1001
+
+# Room key of the lobby (its messages have no room_id)
+LOBBY = None
+
+
+class ConnectionManager:
+    def __init__(self):
+        self.user_of: Dict[WebSocket, int] = {}       # Every live socket
+        self.by_user: Dict[int, WebSocket] = {}       # Latest socket of each user, for private messages
+        self.last_seen: Dict[WebSocket, float] = {}
+        self.rooms: Dict[Optional[int], Set[WebSocket]] = {}           # Subscribers of each room
+        self.subscriptions: Dict[WebSocket, Set[Optional[int]]] = {}   # Rooms of each socket
+        self.protocols: Dict[WebSocket, str] = {}
+        self.senders: Dict[WebSocket, Dict[int, dict]] = {}   # Profiles already sent to compact connections
+        self._heartbeat: Optional[asyncio.Task] = None
+        # Counters for metrics
+        self.reaped = 0
+        self.send_failures = 0
+
+    async def connect(self, websocket: WebSocket, user_id: int, protocol: str = chat_protocol.JSON):
+        await websocket.accept(subprotocol=chat_protocol.subprotocol_header(protocol))
+        self.protocols[websocket] = protocol
+        self.user_of[websocket] = user_id
+        self.by_user[user_id] = websocket
+        self.last_seen[websocket] = time.monotonic()
+        self.subscribe(websocket, LOBBY)
+        self._ensure_heartbeat()
+
+    def disconnect(self, websocket: WebSocket, user_id: Optional[int] = None):
+        """
+        Forget a socket. Safe to call more than once.
+        """
+        user_id = self.user_of.pop(websocket, user_id)
+        self.last_seen.pop(websocket, None)
+        self.protocols.pop(websocket, None)
+        self.senders.pop(websocket, None)
+        for room_id in self.subscriptions.pop(websocket, ()):
+            self._leave(websocket, room_id)
+        # A newer connection of the same user stays registered
+        if user_id is not None and self.by_user.get(user_id) is websocket:
+            del self.by_user[user_id]
+
+    # --- Rooms ---
+
+    def subscribe(self, websocket: WebSocket, room_id: Optional[int]) -> bool:
+        """
+        Add a socket to a room. False if it is already in WS_MAX_ROOMS rooms.
+        """
+        rooms = self.subscriptions.setdefault(websocket, set())
+        if room_id not in rooms:
+            if room_id is not LOBBY and len(rooms - {LOBBY}) >= settings.WS_MAX_ROOMS:
+                return False
+            rooms.add(room_id)
+            self.rooms.setdefault(room_id, set()).add(websocket)
+        return True
+
+    def unsubscribe(self, websocket: WebSocket, room_id: Optional[int]) -> None:
+        rooms = self.subscriptions.get(websocket)
+        if rooms and room_id in rooms:
+            rooms.discard(room_id)
+            self._leave(websocket, room_id)
+
+    def _leave(self, websocket: WebSocket, room_id: Optional[int]) -> None:
+        members = self.rooms.get(room_id)
+        if members is not None:
+            members.discard(websocket)
+            if not members:
+                del self.rooms[room_id]
+
+    def is_subscribed(self, websocket: WebSocket, room_id: Optional[int]) -> bool:
+        return room_id in self.subscriptions.get(websocket, ())
+
+    def touch(self, websocket: WebSocket) -> None:
+        if websocket in self.last_seen:
+            self.last_seen[websocket] = time.monotonic()
+
+    # --- Sending ---
+
+    async def _send(self, websocket: WebSocket, data: chat_protocol.Frame) -> bool:
+        send = websocket.send_bytes if isinstance(data, bytes) else websocket.send_text
+        try:
+            # A timer rather than wait_for(), which wraps every send in a task
+            async with asyncio.timeout(settings.WS_SEND_TIMEOUT):
+                await send(data)
+            return True
+        except Exception:
+            self.send_failures += 1
+            await self.reap(websocket)
+            return False
+
+    async def send(self, websocket: WebSocket, frame: dict) -> bool:
+        """
+        Send a control frame (error, pong, ...) in the connection's format.
+        """
+        protocol = self.protocols.get(websocket, chat_protocol.JSON)
+        return await self._send(websocket, chat_protocol.encode(protocol, frame))
+
+    async def _deliver(self, websocket: WebSocket, frames: chat_protocol.MessageFrames) -> bool:
+        """
+        Send a chat message, preceded by its sender's profile if this
+        compact connection has not seen it yet.
+        """
+        protocol = self.protocols.get(websocket, chat_protocol.JSON)
+        sender = frames.sender
+        if sender is None or protocol == chat_protocol.JSON:
+            return await self._send(websocket, frames.message(protocol))
+
+        known = self.senders.setdefault(websocket, {})
+        if known.get(sender["id"]) != sender:
+            known[sender["id"]] = sender
+            if not await self._send(websocket, frames.user(protocol)):
+                return False
+        return await self._send(websocket, frames.message(protocol))
+
+    async def broadcast(self, message: dict, room_id: Optional[int] = LOBBY):
+        """
+        Send to the subscribers of a room (by default the lobby). The frames
+        are encoded once per format and the same bytes go to every socket.
+        """
+        sockets = self.rooms.get(room_id)
+        if sockets:
+            frames = chat_protocol.MessageFrames(message)
+            await asyncio.gather(*(self._deliver(websocket, frames) for websocket in list(sockets)))
+
+    async def send_personal_message(self, message: dict, user_id: int):
+        websocket = self.by_user.get(user_id)
+        if websocket is not None:
+            await self._deliver(websocket, chat_protocol.MessageFrames(message))
+
+    async def reap(self, websocket: WebSocket) -> None:
+        """
+        Drop a dead or silent connection and try to close it.
+        """
+        if websocket not in self.user_of:
+            return
+        self.disconnect(websocket)
+        self.reaped += 1
+        try:
+            await asyncio.wait_for(websocket.close(code=REAPED_CLOSE_CODE), settings.WS_SEND_TIMEOUT)
+        except Exception:
+            pass
+
+    # --- Heartbeat ---
+
+    def _ensure_heartbeat(self) -> None:
+        loop = asyncio.get_running_loop()
+        task = self._heartbeat
+        if task is None or task.done() or task.get_loop() is not loop:
+            self._heartbeat = loop.create_task(self._run_heartbeat())
+
+    async def stop(self) -> None:
+        """
+        Stop the heartbeat (application shutdown).
+        """
+        task, self._heartbeat = self._heartbeat, None
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _run_heartbeat(self) -> None:
+        interval = settings.WS_PING_INTERVAL
+        while True:
+            await asyncio.sleep(min(interval, settings.WS_PING_TIMEOUT) / 2)
+            try:
+                await self.check()
+            except Exception:
+                logger.exception("WebSocket heartbeat failed")
+
+    async def check(self, now: Optional[float] = None) -> None:
+        """
+        Ping quiet connections and reap the ones that stopped answering.
+        """
+        now = time.monotonic() if now is None else now
+        ping, reap = [], []
+        for websocket, last_seen in list(self.last_seen.items()):
+            idle = now - last_seen
+            if idle >= settings.WS_PING_INTERVAL + settings.WS_PING_TIMEOUT:
+                reap.append(websocket)
+            elif idle >= settings.WS_PING_INTERVAL:
+                ping.append(websocket)
+        for websocket in reap:
+            await self.reap(websocket)
+        if ping:
+            await asyncio.gather(*(self.send(websocket, {"type": "ping"}) for websocket in ping))
+
+    def metrics(self) -> dict:
+        return {
+            "connections": len(self.user_of),
+            "users": len(self.by_user),
+            "rooms": len(self.rooms),
+            "subscriptions": sum(len(members) for members in self.rooms.values()),
+            "protocols": dict(Counter(self.protocols.values())),
+            "reaped": self.reaped,
+            "send_failures": self.send_failures,
+        }
+
+
+manager = ConnectionManager()
@@ -0,0 +1,122 @@
+"""
+Streamed exports of attendance records and work items.
+
+Rows are read with yield_per, so the driver cursor is consumed one chunk at
+a time and never materialized, and every chunk is encoded and handed to the
+response as soon as it is read. Memory stays bounded by the chunk size, and
+the header (CSV) goes out before the first query returns.
+"""
+import csv
+import io
+from datetime import date, datetime, timedelta
+from typing import Iterator, List, Optional, Sequence
+
+from pydantic_core import to_json
+
+from app.db.repository import SessionLocal
+from app.models.user import User
+from app.models.work import WorkItem, WorkRecord
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+RECORD_COLUMNS = {
+    "id": WorkRecord.id,
+    "user_id": WorkRecord.user_id,
+    "username": User.username,
+    "nickname": User.nickname,
+    "date": WorkRecord.date,
+    "clock_in_time": WorkRecord.clock_in_time,
+    "clock_out_time": WorkRecord.clock_out_time,
+}
+
+ITEM_COLUMNS = {
+    "id": WorkItem.id,
+    "user_id": WorkItem.user_id,
+    "username": User.username,
+    "nickname": User.nickname,
+    "type": WorkItem.type,
+    "content": WorkItem.content,
+    "status": WorkItem.status,
+    "percentage": WorkItem.percentage,
+    "created_at": WorkItem.created_at,
+    "updated_at": WorkItem.updated_at,
+}
+
+
+def _records_query(db, user_ids: Optional[List[int]], start: Optional[date], end: Optional[date]):
+    query = db.query(*RECORD_COLUMNS.values()).outerjoin(User, User.id == WorkRecord.user_id)
+    if user_ids:
+        query = query.filter(WorkRecord.user_id.in_(user_ids))
+    # YYYY-MM-DD strings compare like dates
+    if start:
+        query = query.filter(WorkRecord.date >= start.isoformat())
+    if end:
+        query = query.filter(WorkRecord.date <= end.isoformat())
+    return query.order_by(WorkRecord.user_id, WorkRecord.date, WorkRecord.id)
+
+
+def _items_query(db, user_ids: Optional[List[int]], start: Optional[date], end: Optional[date]):
+    query = db.query(*ITEM_COLUMNS.values()).outerjoin(User, User.id == WorkItem.user_id)
+    if user_ids:
+        query = query.filter(WorkItem.user_id.in_(user_ids))
+    if start:
+        query = query.filter(WorkItem.created_at >= datetime.combine(start, datetime.min.time()))
+    if end:
+        query = query.filter(WorkItem.created_at < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    return query.order_by(WorkItem.id)
+
+
+QUERIES = {
+    "records": (RECORD_COLUMNS, _records_query),
+    "items": (ITEM_COLUMNS, _items_query),
+}
+
+
+def _encode_csv(keys: Sequence[str], rows: Sequence[tuple], header: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(keys)
+    writer.writerows(
+        [value.isoformat(sep=" ") if isinstance(value, datetime) else value for value in row]
+        for row in rows
+    )
+    return buffer.getvalue().encode()
+
+
+def _encode_ndjson(keys: Sequence[str], rows: Sequence[tuple]) -> bytes:
+    return b"".join(to_json(dict(zip(keys, row))) + b"\n" for row in rows)
+
+
+def stream(
+    kind: str,
+    fmt: str,
+    user_ids: Optional[List[int]] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    chunk_size: int = 1000,
+) -> Iterator[bytes]:
+    """
+    Yield the export body chunk by chunk. Uses its own session, since the
+    response outlives the request's dependencies.
+    """
+    columns, build_query = QUERIES[kind]
+    keys = list(columns)
+    if fmt == "csv":
+        # Header first, so the client sees the download start right away
+        yield _encode_csv(keys, [], header=True)
+
+    db = SessionLocal()
+    try:
+        statement = build_query(db, user_ids, start, end).statement
+        result = db.execute(statement, execution_options={"yield_per": chunk_size})
+        for rows in result.partitions():
+            if fmt == "csv":
+                yield _encode_csv(keys, rows, header=False)
+            else:
+                yield _encode_ndjson(keys, rows)
+    finally:
+        db.close()
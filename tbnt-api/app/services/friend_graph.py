@@ -0,0 +1,236 @@
+"""
+In-memory index of the friendships table.
+
+Every process keeps the friendship edges as adjacency sets (accepted
+friends, pending incoming and outgoing requests) so friend lists and
+"are these two friends" checks are answered in O(degree) without an
+OR-query over friendships. Writes in this process update the index
+directly; changes made by other workers are picked up by an incremental
+query at most every FRIEND_GRAPH_REFRESH seconds.
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.friend import Friendship
+
+PENDING, ACCEPTED, REJECTED = 0, 1, 2
+
+
+class Edge(NamedTuple):
+    id: int
+    user_id: int     # Requester
+    friend_id: int   # Target
+    status: int
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+    def other(self, user_id: int) -> int:
+        return self.friend_id if self.user_id == user_id else self.user_id
+
+
+def edge_dict(edge: Edge, friend_info: Optional[dict]) -> dict:
+    """
+    An edge shaped like the Friendship response schema.
+    """
+    return {
+        "id": edge.id,
+        "user_id": edge.user_id,
+        "friend_id": edge.friend_id,
+        "status": edge.status,
+        "created_at": edge.created_at,
+        "friend_info": friend_info,
+    }
+
+
+def _pair(a: int, b: int) -> Tuple[int, int]:
+    return (a, b) if a < b else (b, a)
+
+
+class FriendGraph:
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._edges: Dict[Tuple[int, int], Edge] = {}
+        self._by_id: Dict[int, Tuple[int, int]] = {}
+        self._friends: Dict[int, Set[int]] = {}
+        self._incoming: Dict[int, Set[int]] = {}
+        self._outgoing: Dict[int, Set[int]] = {}
+        self._row_ids: Set[int] = set()  # Every friendships row the index has seen
+        self._max_id = 0
+        self._max_updated_at: Optional[datetime] = None
+        self._checked_at = 0.0
+        self.loaded = False
+
+    # --- Loading ---
+
+    COLUMNS = (
+        Friendship.id, Friendship.user_id, Friendship.friend_id, Friendship.status,
+        Friendship.created_at, Friendship.updated_at
+    )
+
+    def load(self, db: Session) -> None:
+        """
+        (Re)build the whole index with one query.
+        """
+        rows = db.query(*self.COLUMNS).order_by(Friendship.id).all()
+        with self._lock:
+            self._edges.clear()
+            self._by_id.clear()
+            self._row_ids.clear()
+            self._friends.clear()
+            self._incoming.clear()
+            self._outgoing.clear()
+            self._max_id = 0
+            self._max_updated_at = None
+            for row in rows:
+                self._add(Edge(*row))
+            self._checked_at = time.monotonic()
+            self.loaded = True
+
+    def refresh_if_stale(self, db: Session) -> None:
+        """
+        Pick up rows written by other processes: new or updated rows are
+        applied incrementally, deletions (row count mismatch) trigger a reload.
+        """
+        if not self.loaded:
+            self.load(db)
+            return
+        now = time.monotonic()
+        if now - self._checked_at < settings.FRIEND_GRAPH_REFRESH:
+            return
+        self._checked_at = now
+
+        changed = Friendship.id > self._max_id
+        if self._max_updated_at is not None:
+            changed = or_(changed, Friendship.updated_at >= self._max_updated_at)
+        rows = db.query(*self.COLUMNS).filter(changed).order_by(Friendship.id).all()
+        count = db.query(func.count(Friendship.id)).scalar()
+        with self._lock:
+            for row in rows:
+                self._add(Edge(*row))
+            in_sync = count == len(self._row_ids)
+        if not in_sync:
+            self.load(db)
+
+    # --- Updates ---
+
+    def _add(self, edge: Edge) -> None:
+        pair = _pair(edge.user_id, edge.friend_id)
+        if pair in self._edges:
+            self._unlink(self._edges[pair])
+        self._edges[pair] = edge
+        self._by_id[edge.id] = pair
+        self._row_ids.add(edge.id)
+        self._max_id = max(self._max_id, edge.id)
+        if edge.updated_at is not None and (self._max_updated_at is None or edge.updated_at > self._max_updated_at):
+            self._max_updated_at = edge.updated_at
+
+        if edge.status == ACCEPTED:
+            self._friends.setdefault(edge.user_id, set()).add(edge.friend_id)
+            self._friends.setdefault(edge.friend_id, set()).add(edge.user_id)
+        elif edge.status == PENDING:
+            self._outgoing.setdefault(edge.user_id, set()).add(edge.friend_id)
+            self._incoming.setdefault(edge.friend_id, set()).add(edge.user_id)
+
+    def _unlink(self, edge: Edge) -> None:
+        """
+        Drop an edge from the adjacency sets (the row may still exist).
+        """
+        pair = _pair(edge.user_id, edge.friend_id)
+        if pair in self._edges and self._edges[pair].id == edge.id:
+            del self._edges[pair]
+        self._by_id.pop(edge.id, None)
+        for index, a, b in (
+            (self._friends, edge.user_id, edge.friend_id),
+            (self._friends, edge.friend_id, edge.user_id),
+            (self._outgoing, edge.user_id, edge.friend_id),
+            (self._incoming, edge.friend_id, edge.user_id),
+        ):
+            ids = index.get(a)
+            if ids is not None:
+                ids.discard(b)
+                if not ids:
+                    del index[a]
+
+    def apply(self, friendship: Friendship) -> None:
+        """
+        Record a created or updated friendship row (after commit).
+        """
+        edge = Edge(
+            friendship.id, friendship.user_id, friendship.friend_id, friendship.status,
+            friendship.created_at, friendship.updated_at
+        )
+        with self._lock:
+            self._add(edge)
+
+    def remove(self, edge: Edge) -> None:
+        """
+        Record a deleted friendship row (after commit).
+        """
+        with self._lock:
+            self._unlink(edge)
+            self._row_ids.discard(edge.id)
+
+    # --- Queries ---
+
+    def edge(self, a: int, b: int) -> Optional[Edge]:
+        return self._edges.get(_pair(a, b))
+
+    def edge_by_id(self, friendship_id: int) -> Optional[Edge]:
+        with self._lock:
+            pair = self._by_id.get(friendship_id)
+            return self._edges.get(pair) if pair else None
+
+    def are_friends(self, a: int, b: int) -> bool:
+        edge = self._edges.get(_pair(a, b))
+        return edge is not None and edge.status == ACCEPTED
+
+    def friend_ids(self, user_id: int) -> Set[int]:
+        with self._lock:
+            return set(self._friends.get(user_id, ()))
+
+    def accepted_pairs(self) -> List[Tuple[int, int]]:
+        with self._lock:
+            return [pair for pair, edge in self._edges.items() if edge.status == ACCEPTED]
+
+    def friend_edges(self, user_id: int) -> List[Edge]:
+        with self._lock:
+            return [self._edges[_pair(user_id, other)] for other in self._friends.get(user_id, ())]
+
+    def incoming_edges(self, user_id: int) -> List[Edge]:
+        with self._lock:
+            return [self._edges[_pair(user_id, other)] for other in self._incoming.get(user_id, ())]
+
+    def outgoing_edges(self, user_id: int) -> List[Edge]:
+        with self._lock:
+            return [self._edges[_pair(user_id, other)] for other in self._outgoing.get(user_id, ())]
+
+    @staticmethod
+    def version_of(edges: List[Edge]) -> Tuple:
+        """
+        Cheap version of an edge list, for ETags.
+        """
+        if not edges:
+            return (0, None, None)
+        return (
+            len(edges),
+            max(edge.id for edge in edges),
+            max((edge.updated_at for edge in edges if edge.updated_at), default=None),
+        )
+
+
+graph = FriendGraph()
+
+
+def get_graph(db: Session) -> FriendGraph:
+    """
+    The process-wide graph, loaded on first use and kept in sync with
+    writes from other workers.
+    """
+    graph.refresh_if_stale(db)
+    return graph
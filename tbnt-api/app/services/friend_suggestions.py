@@ -0,0 +1,100 @@
+"""
+Mutual friends and "people you may know".
+
+Accepted friendships are packed into a compressed sparse row layout: every
+user gets a dense index, and the sorted friend indexes of user i are
+indices[indptr[i]:indptr[i + 1]] (int32). Mutual counts and candidate
+scoring are then numpy set operations over those arrays instead of
+per-user queries. The snapshot is rebuilt from the in-memory friend graph
+at most every SUGGESTIONS_REFRESH seconds.
+"""
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.friend_graph import FriendGraph
+
+
+class SuggestionIndex:
+    def __init__(self, pairs: Iterable[Tuple[int, int]]) -> None:
+        pairs = np.asarray(list(pairs), dtype=np.int64).reshape(-1, 2)
+        self.user_ids = np.unique(pairs)  # Dense index -> user id (sorted)
+        n = len(self.user_ids)
+
+        idx = np.searchsorted(self.user_ids, pairs).astype(np.int32)
+        src = np.concatenate([idx[:, 0], idx[:, 1]])
+        dst = np.concatenate([idx[:, 1], idx[:, 0]])
+        order = np.lexsort((dst, src))
+
+        self.indices = dst[order]
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=self.indptr[1:])
+        self.built_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def _index(self, user_id: int) -> Optional[int]:
+        i = int(np.searchsorted(self.user_ids, user_id))
+        if i < len(self.user_ids) and self.user_ids[i] == user_id:
+            return i
+        return None
+
+    def _neighbors(self, i: int) -> np.ndarray:
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def mutual_friends(self, a: int, b: int) -> List[int]:
+        ia, ib = self._index(a), self._index(b)
+        if ia is None or ib is None:
+            return []
+        common = np.intersect1d(self._neighbors(ia), self._neighbors(ib), assume_unique=True)
+        return self.user_ids[common].tolist()
+
+    def suggest(self, user_id: int, limit: int = 10) -> List[Tuple[int, int]]:
+        """
+        Top friends-of-friends by number of mutual friends, as
+        (user_id, mutual_count) pairs.
+        """
+        i = self._index(user_id)
+        if i is None:
+            return []
+        friends = self._neighbors(i)
+        if len(friends) == 0:
+            return []
+
+        # Every occurrence of a candidate among my friends' friends is one mutual friend
+        starts, ends = self.indptr[friends], self.indptr[friends + 1]
+        lengths = ends - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        candidates, scores = np.unique(self.indices[offsets], return_counts=True)
+        keep = ~np.isin(candidates, friends, assume_unique=True) & (candidates != i)
+        candidates, scores = candidates[keep], scores[keep]
+
+        if len(candidates) > limit:
+            # Keep everything tied with the limit-th best so ties resolve by id below
+            kth = np.partition(scores, len(scores) - limit)[len(scores) - limit]
+            candidates, scores = candidates[scores >= kth], scores[scores >= kth]
+        # Highest score first, lower user id breaks ties
+        order = np.lexsort((candidates, -scores))[:limit]
+        return [(int(self.user_ids[c]), int(n)) for c, n in zip(candidates[order], scores[order])]
+
+
+_index: Optional[SuggestionIndex] = None
+_lock = threading.Lock()
+
+
+def get_index(graph: FriendGraph) -> SuggestionIndex:
+    """
+    The current snapshot, rebuilt when older than SUGGESTIONS_REFRESH.
+    """
+    global _index
+    index = _index
+    if index is not None and time.monotonic() - index.built_at < settings.SUGGESTIONS_REFRESH:
+        return index
+    with _lock:
+        if _index is None or time.monotonic() - _index.built_at >= settings.SUGGESTIONS_REFRESH:
+            _index = SuggestionIndex(graph.accepted_pairs())
+        return _index
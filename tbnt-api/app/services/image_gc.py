@@ -0,0 +1,208 @@
+"""
+Garbage collection of uploaded images that are no longer referenced.
+
+A file is referenced when an image chat message or a user avatar points at
+it (the original or one of its variants). Each step scans a few shard
+directories and resumes where the previous step stopped, so a full pass is
+spread over many small steps.
+
+Files not yet moved into shards (app/commands/shard_images.py) are
+collected too: the last step of a pass scans IMAGE_DIR itself, and there
+only upload names (<uuid4>.<ext>), never other files that live next to them.
+"""
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from app.core import images
+from app.core.config import settings
+from app.core.static import IMMUTABLE_NAME
+from app.db.repository import SessionLocal
+from app.models.chat import ChatMessage
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+ENCODED_SUFFIXES = (".gz", ".br")
+
+# Pseudo-shard for the legacy flat layout (files directly in IMAGE_DIR)
+FLAT = ""
+
+
+def all_shards() -> List[str]:
+    width = images.SHARD_CHARS
+    return [f"{i:0{width}x}" for i in range(16 ** width)] + [FLAT]
+
+
+def _in_shard(shard: str, filename: str) -> str:
+    return f"{shard}/{filename}" if shard != FLAT else filename
+
+
+def _state_path() -> Path:
+    # Kept outside IMAGE_DIR so it is never served under /static
+    return settings.IMAGE_DIR.parent / "image_gc.json"
+
+
+def _lock_path() -> Path:
+    return settings.IMAGE_DIR.parent / "image_gc.lock"
+
+
+def _load_cursor() -> int:
+    try:
+        return int(json.loads(_state_path().read_text())["next_shard"])
+    except (OSError, ValueError, KeyError):
+        return 0
+
+
+def _save_cursor(cursor: int) -> None:
+    path = _state_path()
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"next_shard": cursor, "updated_at": int(time.time())}))
+    os.replace(tmp, path)
+
+
+def reference_urls(filename: str) -> List[str]:
+    """
+    Every URL under which a stored file may have been referenced.
+    """
+    names = [filename, images.sharded_name(filename)]
+    urls = [images.image_url(name) for name in names]
+    for variant in images.VARIANTS:
+        urls.extend(images.image_url(images.variant_name(name, variant)) for name in names)
+    return urls
+
+
+def find_referenced(db: Session, filenames: Iterable[str]) -> Set[str]:
+    """
+    Return the subset of filenames that a message or avatar still points at.
+    """
+    filenames = list(filenames)
+    referenced: Set[str] = set()
+    for i in range(0, len(filenames), BATCH_SIZE):
+        url_to_name = {}
+        for filename in filenames[i:i + BATCH_SIZE]:
+            for url in reference_urls(filename):
+                url_to_name[url] = filename
+        urls = list(url_to_name)
+
+        rows = db.query(ChatMessage.content).filter(
+            ChatMessage.message_type == "image",
+            ChatMessage.content.in_(urls)
+        ).all()
+        rows += db.query(User.avatar).filter(User.avatar.in_(urls)).all()
+        referenced.update(url_to_name[url] for (url,) in rows)
+    return referenced
+
+
+def _unlink(path: Path) -> bool:
+    try:
+        path.unlink()
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def delete_image(name: str) -> None:
+    """
+    Delete a stored file together with its compressed copies and variants.
+    """
+    path = settings.IMAGE_DIR / name
+    _unlink(path)
+    for suffix in ENCODED_SUFFIXES:
+        _unlink(path.with_name(path.name + suffix))
+    for variant in images.VARIANTS:
+        _unlink(settings.IMAGE_DIR / images.variant_name(name, variant))
+
+
+def collect_shard(db: Session, shard: str, now: Optional[float] = None) -> int:
+    """
+    Delete unreferenced files in one shard that are older than the grace
+    period. Returns the number of deleted originals.
+    """
+    now = time.time() if now is None else now
+    cutoff = now - settings.IMAGE_GC_GRACE
+    shard_dir = settings.IMAGE_DIR / shard
+
+    candidates = []
+    if shard_dir.is_dir():
+        for entry in os.scandir(shard_dir):
+            if not entry.is_file() or entry.name.endswith(ENCODED_SUFFIXES + (".tmp",)):
+                continue
+            if shard == FLAT and not IMMUTABLE_NAME.match(entry.name):
+                continue
+            if entry.stat().st_mtime < cutoff:
+                candidates.append(entry.name)
+
+    referenced = find_referenced(db, candidates)
+    deleted = 0
+    for filename in candidates:
+        if filename not in referenced:
+            delete_image(_in_shard(shard, filename))
+            deleted += 1
+
+    # Variants whose original is gone
+    for variant in images.VARIANTS:
+        variant_dir = settings.IMAGE_DIR / images.VARIANT_DIR / variant / shard
+        if not variant_dir.is_dir():
+            continue
+        for entry in os.scandir(variant_dir):
+            if not entry.is_file() or not entry.name.endswith(images.VARIANT_EXT):
+                continue
+            original = entry.name[: -len(images.VARIANT_EXT)]
+            if shard == FLAT and not IMMUTABLE_NAME.match(original):
+                continue
+            if not (shard_dir / original).exists():
+                if entry.stat().st_mtime < cutoff:
+                    _unlink(Path(entry.path))
+
+    return deleted
+
+
+def run_step(shards_per_run: Optional[int] = None) -> Optional[int]:
+    """
+    Run one incremental GC step. Returns the number of deleted files, or
+    None if another process is already collecting.
+    """
+    shards_per_run = shards_per_run or settings.IMAGE_GC_SHARDS_PER_RUN
+    shards = all_shards()
+
+    _lock_path().parent.mkdir(parents=True, exist_ok=True)
+    with open(_lock_path(), "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+
+        cursor = _load_cursor() % len(shards)
+        deleted = 0
+        db = SessionLocal()
+        try:
+            for offset in range(min(shards_per_run, len(shards))):
+                deleted += collect_shard(db, shards[(cursor + offset) % len(shards)])
+        finally:
+            db.close()
+        _save_cursor((cursor + shards_per_run) % len(shards))
+
+    if deleted:
+        logger.info("Image GC deleted %d unreferenced files", deleted)
+    return deleted
+
+
+async def run_periodically() -> None:
+    """
+    Background task started by the application lifespan.
+    """
+    while True:
+        await asyncio.sleep(settings.IMAGE_GC_INTERVAL)
+        try:
+            await asyncio.to_thread(run_step)
+        except Exception:
+            logger.exception("Image GC step failed")
@@ -0,0 +1,24 @@
+from typing import Dict, Iterable
+
+from sqlalchemy.orm import Session
+
+from app.api.models.user import PublicUser as PublicUserSchema, User as UserSchema
+from app.api.serialization import Projection
+from app.models.user import User
+
+# Profile columns returned as friend_info / sender (see app/api/serialization.py)
+PROFILE_FIELDS = Projection(UserSchema, User)
+# Profiles of people who are not friends, e.g. suggestions
+PUBLIC_PROFILE_FIELDS = Projection(PublicUserSchema, User)
+
+
+def load_profiles(db: Session, user_ids: Iterable[int], fields: Projection = PROFILE_FIELDS) -> Dict[int, dict]:
+    """
+    Batch-load profiles for a set of users with one query.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return {}
+    rows = db.query(*fields.columns).filter(User.id.in_(user_ids)).all()
+    profiles = [fields.to_dict(row) for row in rows]
+    return {profile["id"]: profile for profile in profiles}
@@ -0,0 +1,98 @@
+"""
+Read receipts sent over the chat WebSocket.
+
+A client reports {"type": "read", "friend_id": F, "message_id": N} when it
+has shown F's messages up to id N. Reports are coalesced for
+READ_RECEIPT_DELAY seconds, keeping the highest id per (reader, friend),
+and then written in one transaction: one UPDATE per conversation, bounded
+by the id and served from ix_chat_messages_inbox (to_user_id, is_read,
+user_id), whose entries end with the rowid. Friends whose messages were
+marked get {"type": "read", "user_id": reader, "message_id": N}.
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.db.repository import SessionLocal
+from app.models.chat import ChatMessage
+from app.services.connections import manager
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[int, int]  # (reader, friend)
+
+
+def write(marks: Dict[Key, int]) -> List[Tuple[int, int, int]]:
+    """
+    Mark messages read up to the given ids. Returns (reader, friend, id)
+    for the conversations that changed.
+    """
+    changed = []
+    db = SessionLocal()
+    try:
+        for (reader_id, friend_id), message_id in marks.items():
+            result = db.execute(
+                update(ChatMessage).where(
+                    ChatMessage.to_user_id == reader_id,
+                    ChatMessage.is_read == False,
+                    ChatMessage.user_id == friend_id,
+                    ChatMessage.id <= message_id
+                ).values(is_read=True).execution_options(synchronize_session=False)
+            )
+            if result.rowcount:
+                changed.append((reader_id, friend_id, message_id))
+        db.commit()
+    finally:
+        db.close()
+    return changed
+
+
+class ReadReceipts:
+    def __init__(self):
+        self.pending: Dict[Key, int] = {}
+        self._flush: Optional[asyncio.Task] = None
+        # Counters for metrics
+        self.reports = 0
+        self.batches = 0
+        self.conversations = 0
+
+    def mark(self, reader_id: int, friend_id: int, message_id: int) -> None:
+        key = (reader_id, friend_id)
+        self.reports += 1
+        if message_id > self.pending.get(key, 0):
+            self.pending[key] = message_id
+        if self._flush is None or self._flush.done():
+            self._flush = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(settings.READ_RECEIPT_DELAY)
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Writing read receipts failed")
+
+    async def flush(self) -> None:
+        marks, self.pending = self.pending, {}
+        if not marks:
+            return
+        changed = await asyncio.to_thread(write, marks)
+        self.batches += 1
+        self.conversations += len(marks)
+        for reader_id, friend_id, message_id in changed:
+            await manager.send_personal_message(
+                {"type": "read", "user_id": reader_id, "message_id": message_id}, friend_id
+            )
+
+    def metrics(self) -> dict:
+        return {
+            "reports": self.reports,
+            "batches": self.batches,
+            "conversations": self.conversations,
+            "pending": len(self.pending),
+        }
+
+
+receipts = ReadReceipts()
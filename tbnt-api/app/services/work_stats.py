@@ -0,0 +1,183 @@
+"""
+Work-hours statistics over the work_days rollup.
+
+WorkRecord keeps clock times as strings; every clock-out converts its
+record into a WorkDay row with numeric durations, so a year of statistics
+is one indexed range read of (date, seconds, overtime_seconds).
+"""
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.work import WorkDay, WorkRecord, WorkSettings
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+DATE_FORMAT = "%Y-%m-%d"
+DEFAULT_END_TIME = "18:00"
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    try:
+        return datetime.strptime(value, TIME_FORMAT) if value else None
+    except ValueError:
+        return None
+
+
+def end_time_of(settings: Optional[WorkSettings]) -> str:
+    return settings.end_time if settings and settings.end_time else DEFAULT_END_TIME
+
+
+def measure(record: WorkRecord, end_time: str) -> Optional[Tuple[date, int, int]]:
+    """
+    (date, worked seconds, overtime seconds) of a record, or None if it
+    cannot be parsed.
+    """
+    try:
+        day = datetime.strptime(record.date, DATE_FORMAT).date()
+    except (TypeError, ValueError):
+        return None
+    clock_in, clock_out = _parse_time(record.clock_in_time), _parse_time(record.clock_out_time)
+    if clock_out is None:
+        return day, 0, 0
+    seconds = max(0, int((clock_out - clock_in).total_seconds())) if clock_in else 0
+
+    # end_time is HH:MM or HH:MM:SS
+    end_time = end_time if len(end_time) > 5 else f"{end_time}:00"
+    end = _parse_time(f"{record.date} {end_time}")
+    overtime = max(0, int((clock_out - end).total_seconds())) if end else 0
+    return day, seconds, overtime
+
+
+def record_day(db: Session, record: WorkRecord, end_time: str) -> Optional[WorkDay]:
+    """
+    Create or update the rollup row of a record. The caller commits, so the
+    record and its rollup are written in the same transaction.
+
+    A day with several records is represented by its first one (lowest id),
+    the record clock-out and /records/today use; backfill() applies the
+    same rule. Returns None if the record does not own its day's row.
+    """
+    measured = measure(record, end_time)
+    if measured is None:
+        return None
+    day, seconds, overtime = measured
+    row = db.query(WorkDay).filter(WorkDay.user_id == record.user_id, WorkDay.date == day).first()
+    if not row:
+        row = WorkDay(user_id=record.user_id, date=day)
+        db.add(row)
+    elif row.record_id is not None and row.record_id < record.id:
+        return None
+    row.record_id = record.id
+    row.seconds = seconds
+    row.overtime_seconds = overtime
+    return row
+
+
+def backfill(db: Session, user_id: Optional[int] = None, batch_size: int = 1000) -> int:
+    """
+    Rebuild the rollup from work_records (optionally for one user).
+    Returns the number of rows written.
+    """
+    end_times = {
+        settings.user_id: end_time_of(settings)
+        for settings in db.query(WorkSettings).all()
+    }
+    rows = db.query(WorkDay)
+    records = db.query(WorkRecord).order_by(WorkRecord.id)
+    if user_id is not None:
+        rows = rows.filter(WorkDay.user_id == user_id)
+        records = records.filter(WorkRecord.user_id == user_id)
+    rows.delete(synchronize_session=False)
+
+    written = 0
+    seen = set()
+    batch: List[dict] = []
+    for record in records.yield_per(batch_size):
+        measured = measure(record, end_times.get(record.user_id, DEFAULT_END_TIME))
+        # One rollup row per user and day, the first record of a day wins (as in record_day)
+        if measured is None or (record.user_id, measured[0]) in seen:
+            continue
+        seen.add((record.user_id, measured[0]))
+        day, seconds, overtime = measured
+        batch.append({
+            "user_id": record.user_id, "date": day, "record_id": record.id,
+            "seconds": seconds, "overtime_seconds": overtime, "updated_at": datetime.utcnow(),
+        })
+        if len(batch) >= batch_size:
+            db.bulk_insert_mappings(WorkDay, batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        db.bulk_insert_mappings(WorkDay, batch)
+        written += len(batch)
+    db.commit()
+    return written
+
+
+def period_start(day: date, period: str) -> date:
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _breaks_streak(previous: date, current: date) -> bool:
+    """
+    Whether a working day (Mon-Fri) lies strictly between two worked days.
+    Weekends neither break nor extend a streak.
+    """
+    gap = (current - previous).days - 1
+    if gap >= 3:
+        return True
+    return any((previous + timedelta(days=i)).weekday() < 5 for i in range(1, gap + 1))
+
+
+def streaks(days: List[date], as_of: date) -> Tuple[int, int]:
+    """
+    (current, longest) streaks of consecutive working days in sorted `days`.
+    The current streak is still alive if no working day was missed before
+    `as_of` (which itself may not be clocked out yet).
+    """
+    longest = run = 0
+    previous = None
+    for day in days:
+        run = run + 1 if previous is not None and not _breaks_streak(previous, day) else 1
+        longest = max(longest, run)
+        previous = day
+    if previous is None or (previous < as_of and _breaks_streak(previous, as_of)):
+        return 0, longest
+    return run, longest
+
+
+def statistics(db: Session, user_id: int, start: date, end: date, period: str, today: date) -> dict:
+    """
+    Totals, per-period buckets and streaks between start and end (inclusive).
+    """
+    rows = db.query(WorkDay.date, WorkDay.seconds, WorkDay.overtime_seconds).filter(
+        WorkDay.user_id == user_id,
+        WorkDay.date >= start,
+        WorkDay.date <= end
+    ).order_by(WorkDay.date).all()
+
+    buckets: Dict[date, dict] = {}
+    for day, seconds, overtime in rows:
+        key = period_start(day, period)
+        bucket = buckets.setdefault(key, {"start": key, "days": 0, "seconds": 0, "overtime_seconds": 0})
+        bucket["days"] += 1
+        bucket["seconds"] += seconds or 0
+        bucket["overtime_seconds"] += overtime or 0
+
+    current, longest = streaks([row[0] for row in rows], min(end, today))
+    return {
+        "period": period,
+        "start": start,
+        "end": end,
+        "days": len(rows),
+        "seconds": sum(bucket["seconds"] for bucket in buckets.values()),
+        "overtime_seconds": sum(bucket["overtime_seconds"] for bucket in buckets.values()),
+        "current_streak": current,
+        "longest_streak": longest,
+        "periods": list(buckets.values()),
+    }
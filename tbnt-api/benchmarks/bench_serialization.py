@@ -0,0 +1,114 @@
+"""
+Per-request cost of list serialization: ORM objects validated against the
+response_model and JSON-encoded by FastAPI, versus the column projection
+fast path in app/api/serialization.py.
+
+    cd tbnt-api && python -m benchmarks.bench_serialization [--messages 50] [--records 365]
+"""
+import argparse
+import json
+import os
+import tempfile
+import timeit
+from datetime import datetime, timedelta
+from typing import List
+
+# Use a throwaway database, never the application one
+_tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_tmp.name}"
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.api import serialization
+from app.api.endpoints import chat, work
+from app.db.migrations import upgrade_schema
+from app.db.repository import SessionLocal, engine
+from app.models.chat import ChatMessage
+from app.models.user import User
+from app.models.work import WorkRecord
+from app.schemas.chat import ChatMessage as ChatMessageSchema
+from app.schemas.work import WorkRecord as WorkRecordSchema
+
+
+def seed(db, messages: int, records: int) -> None:
+    users = [
+        User(username=f"user{i}", nickname=f"User {i}", avatar=f"/static/ab/{i}.png",
+             hashed_password="x", number=100000 + i, chat_color="#3b82f6")
+        for i in range(20)
+    ]
+    db.add_all(users)
+    db.flush()
+    db.add_all(
+        ChatMessage(user_id=users[i % len(users)].id, content=f"message {i} " * 5,
+                    message_type="text", created_at="2026-01-01 12:00:00")
+        for i in range(messages)
+    )
+    day = datetime(2025, 1, 1)
+    db.add_all(
+        WorkRecord(user_id=users[0].id, date=(day + timedelta(days=i)).strftime("%Y-%m-%d"),
+                   clock_in_time="2025-01-01 09:00:00", clock_out_time="2025-01-01 18:30:00")
+        for i in range(records)
+    )
+    db.commit()
+
+
+def classic(adapter: TypeAdapter, objects: List) -> bytes:
+    """
+    What FastAPI does with a response_model: validate, dump, jsonable_encoder, json.dumps.
+    """
+    value = adapter.validate_python(objects, from_attributes=True)
+    content = jsonable_encoder(adapter.dump_python(value, mode="json"))
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=50, help="history page size")
+    parser.add_argument("--records", type=int, default=365, help="work records per user")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    upgrade_schema(engine)
+    db = SessionLocal()
+    seed(db, args.messages, args.records)
+    user_id = db.query(User.id).first()[0]
+
+    message_adapter = TypeAdapter(List[ChatMessageSchema])
+    record_adapter = TypeAdapter(List[WorkRecordSchema])
+
+    def history_classic():
+        db.expunge_all()  # Every request starts with an empty session
+        objects = db.query(ChatMessage).order_by(ChatMessage.id.desc()).limit(args.messages).all()
+        return classic(message_adapter, objects[::-1])
+
+    def history_fast():
+        rows = chat.query_messages(db).order_by(ChatMessage.id.desc()).limit(args.messages).all()
+        return serialization.json_list(chat.serialize_messages(rows[::-1])).body
+
+    def records_classic():
+        db.expunge_all()
+        objects = db.query(WorkRecord).filter(WorkRecord.user_id == user_id).order_by(WorkRecord.date.desc()).all()
+        return classic(record_adapter, objects)
+
+    def records_fast():
+        rows = db.query(*work.RECORD_FIELDS.columns).filter(WorkRecord.user_id == user_id).order_by(WorkRecord.date.desc()).all()
+        return serialization.json_list([work.RECORD_FIELDS.to_dict(row) for row in rows]).body
+
+    cases = [
+        (f"chat history ({args.messages} messages)", history_classic, history_fast),
+        (f"work records ({args.records} records)", records_classic, records_fast),
+    ]
+    print(f"{'endpoint':<32}{'classic ms':>12}{'fast ms':>10}{'saved':>8}")
+    for name, slow, fast in cases:
+        assert json.loads(slow()) == json.loads(fast()), f"{name}: outputs differ"
+        slow_ms = min(timeit.repeat(slow, number=args.repeat, repeat=3)) / args.repeat * 1000
+        fast_ms = min(timeit.repeat(fast, number=args.repeat, repeat=3)) / args.repeat * 1000
+        print(f"{name:<32}{slow_ms:>12.3f}{fast_ms:>10.3f}{1 - fast_ms / slow_ms:>8.0%}")
+
+    db.close()
+    os.unlink(_tmp.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Startup cost of a worker and of the production server.
+
+    cd tbnt-api && python -m benchmarks.bench_startup [--runs 5] [--workers 2]
+
+1. Importing app.main in a fresh interpreter, with and without the schema
+   upgrade (DB_INIT_ON_STARTUP), i.e. what every worker pays on (re)start.
+2. python -m app.commands.serve: time until the first request is answered,
+   and time for a clean SIGTERM shutdown.
+"""
+import argparse
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+# Use a throwaway database, never the application one
+_tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+# HTTP only: with the chat WebSocket served, serve would start one worker
+ENV = dict(os.environ, SQLALCHEMY_DATABASE_URI=f"sqlite:///{_tmp.name}", IMAGE_GC_INTERVAL="0", CHAT_WEBSOCKET="0")
+
+
+def time_import(db_init: bool) -> float:
+    env = dict(ENV, DB_INIT_ON_STARTUP="1" if db_init else "0")
+    code = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_server(workers: int) -> tuple:
+    port = free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "app.commands.serve", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=ENV,
+    )
+    try:
+        while True:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1).read()
+                break
+            except OSError:
+                if proc.poll() is not None:
+                    raise RuntimeError("server exited")
+                time.sleep(0.02)
+        ready = time.perf_counter() - started
+    finally:
+        stopping = time.perf_counter()
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=60)
+    return ready, time.perf_counter() - stopping
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    time_import(True)  # Create the schema and warm the file cache
+    for label, db_init in (("import app.main (schema upgrade)", True), ("import app.main (worker)", False)):
+        times = [time_import(db_init) for _ in range(args.runs)]
+        print(f"{label:<34} {statistics.median(times) * 1000:8.1f} ms")
+
+    ready, stop = zip(*(time_server(args.workers) for _ in range(args.runs)))
+    print(f"{'serve: first response':<34} {statistics.median(ready) * 1000:8.1f} ms  ({args.workers} workers)")
+    print(f"{'serve: SIGTERM to exit':<34} {statistics.median(stop) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
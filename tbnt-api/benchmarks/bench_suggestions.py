@@ -0,0 +1,95 @@
+"""
+Friend suggestions and mutual friends on synthetic graphs: the numpy index
+in app/services/friend_suggestions.py versus a naive baseline over Python
+sets (what per-user queries would compute).
+
+    cd tbnt-api && python -m benchmarks.bench_suggestions [--users 10000 100000] [--degree 20]
+"""
+import argparse
+import timeit
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+
+from app.services.friend_suggestions import SuggestionIndex
+
+
+def make_pairs(users: int, degree: int, seed: int = 0) -> List[Tuple[int, int]]:
+    """
+    Random undirected graph with about `degree` friends per user, clustered
+    by id so that friends of friends overlap like real social graphs.
+    """
+    rng = np.random.default_rng(seed)
+    count = users * degree // 2
+    a = rng.integers(1, users + 1, count)
+    b = np.clip(a + rng.integers(-5 * degree, 5 * degree, count), 1, users)
+    pairs = {(int(min(x, y)), int(max(x, y))) for x, y in zip(a, b) if x != y}
+    return sorted(pairs)
+
+
+def naive_adjacency(pairs: List[Tuple[int, int]]) -> Dict[int, Set[int]]:
+    adjacency: Dict[int, Set[int]] = {}
+    for a, b in pairs:
+        adjacency.setdefault(a, set()).add(b)
+        adjacency.setdefault(b, set()).add(a)
+    return adjacency
+
+
+def naive_suggest(adjacency: Dict[int, Set[int]], user_id: int, limit: int) -> List[Tuple[int, int]]:
+    friends = adjacency.get(user_id, set())
+    scores = Counter()
+    for friend in friends:
+        for other in adjacency[friend]:
+            if other != user_id and other not in friends:
+                scores[other] += 1
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+
+def measure(label: str, fn, number: int) -> None:
+    per_call = min(timeit.repeat(fn, number=number, repeat=3)) / number
+    print(f"  {label:<28} {per_call * 1000:9.3f} ms")
+
+
+def run(users: int, degree: int, limit: int) -> None:
+    pairs = make_pairs(users, degree)
+    print(f"{users} users, {len(pairs)} friendships")
+
+    tracemalloc.start()
+    index = SuggestionIndex(pairs)
+    index_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    tracemalloc.start()
+    adjacency = naive_adjacency(pairs)
+    naive_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    sample = np.random.default_rng(1).integers(1, users + 1, 200).tolist()
+    for user_id in sample[:20]:
+        assert index.suggest(user_id, limit) == naive_suggest(adjacency, user_id, limit)
+        expected = sorted(adjacency.get(user_id, set()) & adjacency.get(user_id + 1, set()))
+        assert index.mutual_friends(user_id, user_id + 1) == expected
+
+    print(f"  {'index memory':<28} {index_memory / 2**20:9.1f} MiB")
+    print(f"  {'sets memory':<28} {naive_memory / 2**20:9.1f} MiB")
+    measure("index build", lambda: SuggestionIndex(pairs), 1)
+    measure("sets build", lambda: naive_adjacency(pairs), 1)
+    measure("suggest (index)", lambda: [index.suggest(u, limit) for u in sample], 1)
+    measure("suggest (sets)", lambda: [naive_suggest(adjacency, u, limit) for u in sample], 1)
+    measure("mutual friends (index)", lambda: [index.mutual_friends(u, u + 1) for u in sample], 1)
+    print(f"  (suggest/mutual timings are per {len(sample)} users)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--degree", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+    for users in args.users:
+        run(users, args.degree, args.limit)
+
+
+if __name__ == "__main__":
+    main()
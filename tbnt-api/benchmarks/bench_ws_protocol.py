@@ -0,0 +1,106 @@
+"""
+Lobby broadcast cost per chat WebSocket format (app/services/chat_protocol.py):
+bytes on the wire per message and socket, raw and with permessage-deflate
+(approximated by one zlib stream per socket, as with context takeover),
+and server time per broadcast. "json per socket" is the previous
+behaviour of encoding the frame once for every connection.
+
+    cd tbnt-api && python -m benchmarks.bench_ws_protocol [--sockets 500] [--senders 50] [--messages 200]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import zlib
+
+from app.services import chat_protocol
+from app.services.connections import ConnectionManager
+
+
+class FakeSocket:
+    def __init__(self) -> None:
+        self.frames = []
+
+    async def accept(self, subprotocol=None) -> None:
+        pass
+
+    async def send_text(self, data: str) -> None:
+        self.frames.append(data.encode())
+
+    async def send_bytes(self, data: bytes) -> None:
+        self.frames.append(data)
+
+    def sizes(self):
+        deflate = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        raw = deflated = 0
+        for frame in self.frames:
+            raw += len(frame)
+            # Sync flush per frame; its 4 byte trailer is not sent
+            deflated += len(deflate.compress(frame) + deflate.flush(zlib.Z_SYNC_FLUSH)) - 4
+        return raw, deflated
+
+
+def make_messages(senders: int, count: int):
+    rng = random.Random(0)
+    words = ["今天", "进度", "同步", "一下", "会议", "改到", "下午", "三点", "OK", "收到", "需求", "上线", "测试", "通过"]
+    profiles = [{
+        "id": i, "username": f"user{i}", "nickname": f"同事{i}", "avatar": f"/static/avatars/{i:08x}.png",
+        "chat_color": "#%06x" % rng.randrange(1 << 24), "number": 100000 + i,
+    } for i in range(1, senders + 1)]
+    for i in range(count):
+        sender = rng.choice(profiles)
+        yield {
+            "id": i + 1, "content": "".join(rng.choices(words, k=rng.randint(2, 12))), "message_type": "text",
+            "created_at": "2024-05-01 10:00:00", "user_id": sender["id"], "to_user_id": None,
+            "room_id": None, "sender": sender,
+        }
+
+
+async def run(label: str, protocol: str, sockets: int, messages: list) -> None:
+    manager = ConnectionManager()
+    fakes = [FakeSocket() for _ in range(sockets)]
+    for i, websocket in enumerate(fakes):
+        await manager.connect(websocket, i + 1, protocol)
+    if label == "json per socket":
+        async def broadcast(message):
+            await asyncio.gather(*(
+                manager._send(websocket, json.dumps(message, separators=(",", ":"), ensure_ascii=False))
+                for websocket in fakes
+            ))
+    else:
+        broadcast = manager.broadcast
+
+    started = time.perf_counter()
+    for message in messages:
+        await broadcast(message)
+    elapsed = time.perf_counter() - started
+    sizes = [websocket.sizes() for websocket in fakes[:20]]  # Sockets are alike, sample a few
+    per_message = len(messages) * len(sizes)
+    print(f"  {label:<18} {sum(raw for raw, _ in sizes) / per_message:8.1f} B "
+          f"{sum(deflated for _, deflated in sizes) / per_message:8.1f} B deflated "
+          f"{elapsed / len(messages) * 1000:8.3f} ms/broadcast")
+    manager._heartbeat.cancel()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sockets", type=int, default=500)
+    parser.add_argument("--senders", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=200)
+    args = parser.parse_args()
+
+    messages = list(make_messages(args.senders, args.messages))
+    print(f"{args.sockets} sockets, {args.senders} senders, {args.messages} messages")
+
+    async def all_runs():
+        await run("json per socket", chat_protocol.JSON, args.sockets, messages)
+        await run("json", chat_protocol.JSON, args.sockets, messages)
+        await run("compact", chat_protocol.COMPACT, args.sockets, messages)
+        await run("msgpack", chat_protocol.MSGPACK, args.sockets, messages)
+
+    asyncio.run(all_runs())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Shared fixtures. The app is imported once per test session against a
+throwaway SQLite database and data directory, configured through the
+environment before app.core.config is loaded.
+"""
+import os
+import tempfile
+import uuid
+
+import pytest
+
+_data_dir = tempfile.mkdtemp(prefix="tbnt-tests-")
+os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{_data_dir}/test.db"
+os.environ["IMAGE_DIR"] = f"{_data_dir}/image"
+os.environ["PROFILE_DIR"] = f"{_data_dir}/profiles"
+os.environ["IMAGE_GC_INTERVAL"] = "0"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.core import security  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.db.repository import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.user import User  # noqa: E402
+
+API = settings.API_V1_STR
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def create_user(role_level: int = 5, **fields) -> User:
+    """
+    A user written directly to the database (e.g. an admin, which cannot
+    be registered through the API).
+    """
+    db = SessionLocal()
+    try:
+        username = fields.pop("username", f"user-{uuid.uuid4().hex[:12]}")
+        user = User(
+            username=username,
+            nickname=fields.pop("nickname", username),
+            hashed_password=security.get_password_hash(fields.pop("password", "secret")),
+            role_level=role_level,
+            number=fields.pop("number", uuid.uuid4().int % 900000 + 100000),
+            chat_color="#3b82f6",
+            **fields,
+        )
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        db.expunge(user)
+        return user
+    finally:
+        db.close()
+
+
+def auth_headers(user: User) -> dict:
+    return {"Authorization": f"Bearer {security.create_access_token(user.username)}"}
+
+
+def befriend(client: TestClient, a: User, b: User) -> int:
+    """
+    a asks b, b accepts. Returns the friendship id.
+    """
+    sent = client.post(f"{API}/friends/request", json={"target_number": b.number}, headers=auth_headers(a))
+    assert sent.status_code == 200
+    friendship_id = sent.json()["id"]
+    accepted = client.put(f"{API}/friends/{friendship_id}", json={"status": 1}, headers=auth_headers(b))
+    assert accepted.status_code == 200
+    return friendship_id
+
+
+class RecordingSocket:
+    """
+    Stands in for a WebSocket in ConnectionManager tests; keeps sent frames.
+    """
+
+    def __init__(self) -> None:
+        self.frames = []
+
+    async def accept(self, subprotocol=None) -> None:
+        pass
+
+    async def send_text(self, data: str) -> None:
+        self.frames.append(data)
+
+    async def send_bytes(self, data: bytes) -> None:
+        self.frames.append(data)
+
+
+@pytest.fixture
+def user():
+    return create_user()
+
+
+@pytest.fixture
+def admin():
+    return create_user(role_level=0)
@@ -0,0 +1,21 @@
+from tests.conftest import API, auth_headers
+
+
+def test_register_ignores_role_level(client):
+    response = client.post(f"{API}/auth/register", json={
+        "username": "self-made-admin", "password": "secret", "role_level": 0,
+    })
+    assert response.status_code == 200
+    assert response.json()["role_level"] == 5
+
+    login = client.post(f"{API}/auth/login", data={"username": "self-made-admin", "password": "secret"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    for kind in ("records", "items"):
+        assert client.get(f"{API}/admin/export/{kind}", headers=headers).status_code == 403
+
+
+def test_export_requires_admin(client, user, admin):
+    assert client.get(f"{API}/admin/export/items", headers=auth_headers(user)).status_code == 403
+    response = client.get(f"{API}/admin/export/items?format=ndjson", headers=auth_headers(admin))
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
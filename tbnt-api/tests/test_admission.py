@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from app.core import admission
+from app.core.admission import AdmissionMiddleware, Limiter, Rejected
+from app.core.config import settings
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_classify():
+    assert admission.classify("/auth/login") == "critical"
+    assert admission.classify("/admin/export/items") == "export"
+    assert admission.classify("/chat/history") == "chat"
+    assert admission.classify("/work/items") == admission.DEFAULT_CLASS
+
+
+def test_queue_is_fifo_and_bounded():
+    async def scenario():
+        limiter = Limiter("test", limit=1, queue_size=2)
+        await limiter.acquire(1)
+        order = []
+
+        async def request(name):
+            await limiter.acquire(1)
+            order.append(name)
+
+        waiters = [asyncio.create_task(request(name)) for name in ("a", "b")]
+        await asyncio.sleep(0)
+        assert limiter.metrics()["queued"] == 2
+        # Queue full: rejected at once
+        with pytest.raises(Rejected):
+            await limiter.acquire(1)
+
+        limiter.release()  # Slot goes to "a", active stays 1
+        await waiters[0]
+        assert order == ["a"] and limiter.active == 1
+        limiter.release()
+        await waiters[1]
+        limiter.release()
+        return limiter, order
+
+    limiter, order = run(scenario())
+    assert order == ["a", "b"]
+    metrics = limiter.metrics()
+    assert metrics["active"] == 0 and metrics["queued"] == 0
+    assert metrics["admitted"] == 3 and metrics["rejected"] == 1
+
+
+def test_wait_times_out():
+    async def scenario():
+        limiter = Limiter("test", limit=1, queue_size=5)
+        await limiter.acquire(1)
+        with pytest.raises(Rejected):
+            await limiter.acquire(0.01)
+        # The timed out waiter left the queue and holds no slot
+        assert limiter.metrics()["queued"] == 0
+        limiter.release()
+        await limiter.acquire(0.01)
+        return limiter
+
+    metrics = run(scenario()).metrics()
+    assert metrics["timed_out"] == 1 and metrics["active"] == 1
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def scenario():
+        limiter = Limiter("test", limit=1, queue_size=5)
+        await limiter.acquire(1)
+        waiter = asyncio.create_task(limiter.acquire(1))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limiter.release()
+        return limiter
+
+    assert run(scenario()).active == 0
+
+
+def test_middleware_answers_503_with_retry_after(monkeypatch):
+    monkeypatch.setattr(admission, "_limiters", {"default": Limiter("default", limit=1, queue_size=0)})
+
+    async def scenario():
+        entered, leave = asyncio.Event(), asyncio.Event()
+
+        async def app(scope, receive, send):
+            entered.set()
+            await leave.wait()
+
+        middleware = AdmissionMiddleware(app, prefix="/api/v1")
+        scope = {"type": "http", "path": "/api/v1/work/items", "method": "GET"}
+        first = asyncio.create_task(middleware(scope, None, None))
+        await entered.wait()
+
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        await middleware(scope, None, send)
+        leave.set()
+        await first
+        return sent
+
+    start = run(scenario())[0]
+    assert start["status"] == 503
+    assert (b"retry-after", str(settings.ADMISSION_RETRY_AFTER).encode()) in start["headers"]
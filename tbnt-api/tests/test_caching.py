@@ -0,0 +1,55 @@
+from app.models.chat import ChatMessage
+from tests.conftest import API, auth_headers
+
+
+def revalidate(client, url, headers):
+    """
+    GET twice, the second time with the first response's ETag. Returns
+    the first response.
+    """
+    first = client.get(url, headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert etag.startswith('W/"')
+
+    second = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.headers["etag"] == etag
+    assert second.content == b""
+    return first
+
+
+def test_work_items_not_modified_until_changed(client, user):
+    headers = auth_headers(user)
+    url = f"{API}/work/items?type=memo"
+    first = revalidate(client, url, headers)
+
+    assert client.post(f"{API}/work/items", json={"type": "memo", "content": "new"}, headers=headers).status_code == 200
+    changed = client.get(url, headers={**headers, "If-None-Match": first.headers["etag"]})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != first.headers["etag"]
+    assert [item["content"] for item in changed.json()] == ["new"]
+
+
+def test_chat_history_not_modified_until_new_message(client, user, db):
+    headers = auth_headers(user)
+    url = f"{API}/chat/history"
+    first = revalidate(client, url, headers)
+
+    db.add(ChatMessage(user_id=user.id, content="hello", created_at="2024-05-01 10:00:00"))
+    db.commit()
+    changed = client.get(url, headers={**headers, "If-None-Match": first.headers["etag"]})
+    assert changed.status_code == 200
+    assert changed.json()[-1]["content"] == "hello"
+
+
+def test_etag_list_and_wildcard(client, user, admin):
+    headers = auth_headers(user)
+    url = f"{API}/work/stats"
+    etag = revalidate(client, url, headers).headers["etag"]
+
+    assert client.get(url, headers={**headers, "If-None-Match": f'W/"other", {etag}'}).status_code == 304
+    assert client.get(url, headers={**headers, "If-None-Match": "*"}).status_code == 304
+    assert client.get(url, headers={**headers, "If-None-Match": 'W/"other"'}).status_code == 200
+    # Tags are per user
+    assert client.get(url, headers={**auth_headers(admin), "If-None-Match": etag}).status_code == 200
@@ -0,0 +1,121 @@
+import asyncio
+import json
+
+import msgpack
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import security
+from app.main import app
+from app.services import chat_protocol
+from app.services.connections import ConnectionManager, manager
+from tests.conftest import API, RecordingSocket
+
+
+def ws_url(user) -> str:
+    return f"{API}/chat/ws/{security.create_access_token(user.username)}"
+
+
+def test_plain_json_without_subprotocol(client, user):
+    with client.websocket_connect(ws_url(user)) as ws:
+        assert ws.accepted_subprotocol is None
+        ws.send_text(json.dumps({"type": "text", "content": "hello"}))
+        message = ws.receive_json()
+        assert message["content"] == "hello"
+        assert message["sender"]["id"] == user.id
+
+
+def test_compact_sends_each_sender_once(client, user):
+    with client.websocket_connect(ws_url(user), subprotocols=["unknown", "tbnt.compact.v1"]) as ws:
+        assert ws.accepted_subprotocol == "tbnt.compact.v1"
+        ws.send_text(json.dumps({"type": "text", "content": "one"}))
+        assert ws.receive_json() == {"type": "user", "user": ws_user(user)}
+        first = ws.receive_json()
+        assert first["content"] == "one" and "sender" not in first
+
+        ws.send_text(json.dumps({"type": "text", "content": "two"}))
+        second = ws.receive_json()
+        assert second["content"] == "two" and second["user_id"] == user.id
+
+
+def ws_user(user) -> dict:
+    return {
+        "id": user.id, "username": user.username, "nickname": user.nickname, "avatar": user.avatar,
+        "chat_color": user.chat_color, "number": user.number,
+    }
+
+
+def test_msgpack_frames(client, user):
+    with client.websocket_connect(ws_url(user), subprotocols=["tbnt.msgpack.v1"]) as ws:
+        assert ws.accepted_subprotocol == "tbnt.msgpack.v1"
+        ws.send_bytes(msgpack.packb({"type": "ping"}))
+        assert msgpack.unpackb(ws.receive_bytes()) == {"type": "pong"}
+
+        ws.send_bytes(msgpack.packb({"type": "text", "content": "packed"}))
+        assert msgpack.unpackb(ws.receive_bytes())["type"] == "user"
+        assert msgpack.unpackb(ws.receive_bytes())["content"] == "packed"
+
+
+@pytest.mark.parametrize("frame", [
+    "[1]",
+    '"x"',
+    "42",
+    json.dumps({"type": "text", "content": "hi", "to_user_id": "abc"}),
+    json.dumps({"type": "text", "content": "hi", "room_id": [1]}),
+    json.dumps({"type": "text", "content": {"nested": True}}),
+    json.dumps({"type": "subscribe", "room_id": "lobby"}),
+    json.dumps({"type": "read", "friend_id": 1}),
+    b"\xc1",
+    msgpack.packb([1, 2]),
+])
+def test_malformed_frames_keep_the_connection(client, user, frame):
+    with client.websocket_connect(ws_url(user), subprotocols=["tbnt.compact.v1"]) as ws:
+        if isinstance(frame, bytes):
+            ws.send_bytes(frame)
+        else:
+            ws.send_text(frame)
+        error = ws.receive_json()
+        assert error["type"] == "error" and error["detail"]
+
+        ws.send_text(json.dumps({"type": "ping"}))
+        assert ws.receive_json() == {"type": "pong"}
+
+
+def test_plain_text_is_a_lobby_message(client, user):
+    with client.websocket_connect(ws_url(user)) as ws:
+        ws.send_text("not json")
+        assert ws.receive_json()["content"] == "not json"
+
+
+def test_broadcast_encodes_once_per_format():
+    async def scenario():
+        manager = ConnectionManager()
+        sockets = {protocol: [RecordingSocket(), RecordingSocket()]
+                   for protocol in (chat_protocol.JSON, chat_protocol.COMPACT, chat_protocol.MSGPACK)}
+        for protocol, pair in sockets.items():
+            for websocket in pair:
+                await manager.connect(websocket, len(manager.user_of) + 1, protocol)
+        sender = {"id": 99, "username": "u", "nickname": "u", "avatar": None, "chat_color": "#000000", "number": 1}
+        for content in ("one", "two"):
+            await manager.broadcast({"id": 1, "content": content, "user_id": 99, "sender": dict(sender)})
+        manager._heartbeat.cancel()
+        return sockets
+
+    sockets = asyncio.run(scenario())
+    for protocol, (a, b) in sockets.items():
+        # Same encoded object for every socket of a format
+        assert len(a.frames) == len(b.frames)
+        assert all(x is y for x, y in zip(a.frames, b.frames))
+    # Compact formats announce the sender once, then the messages
+    assert len(sockets[chat_protocol.JSON][0].frames) == 2
+    assert len(sockets[chat_protocol.COMPACT][0].frames) == 3
+    assert msgpack.unpackb(sockets[chat_protocol.MSGPACK][0].frames[0])["type"] == "user"
+
+
+def test_heartbeat_stops_with_the_app(user):
+    with TestClient(app) as client:
+        with client.websocket_connect(ws_url(user)):
+            heartbeat = manager._heartbeat
+            assert heartbeat is not None and not heartbeat.done()
+    assert heartbeat.cancelled()
+    assert manager._heartbeat is None
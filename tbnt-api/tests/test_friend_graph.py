@@ -0,0 +1,70 @@
+import json
+from datetime import datetime
+
+from app.core import security
+from app.core.config import settings
+from app.models.friend import Friendship
+from app.services import friend_graph
+from app.services.friend_graph import ACCEPTED, PENDING, FriendGraph
+from tests.conftest import API, auth_headers, befriend, create_user
+
+
+def friend_ids(client, user) -> list:
+    return [item["friend_info"]["id"] for item in client.get(f"{API}/friends/", headers=auth_headers(user)).json()]
+
+
+def test_edges_move_between_adjacency_sets():
+    graph = FriendGraph()
+    now = datetime(2024, 5, 1)
+    graph.apply(Friendship(id=1, user_id=1, friend_id=2, status=PENDING, created_at=now, updated_at=now))
+    assert [edge.user_id for edge in graph.incoming_edges(2)] == [1]
+    assert [edge.friend_id for edge in graph.outgoing_edges(1)] == [2]
+    assert not graph.are_friends(1, 2)
+
+    graph.apply(Friendship(id=1, user_id=1, friend_id=2, status=ACCEPTED, created_at=now, updated_at=now))
+    assert graph.are_friends(2, 1)
+    assert graph.friend_ids(1) == {2} and graph.friend_ids(2) == {1}
+    assert graph.incoming_edges(2) == [] and graph.outgoing_edges(1) == []
+
+    graph.remove(graph.edge(1, 2))
+    assert not graph.are_friends(1, 2)
+    assert graph.friend_ids(1) == set() and graph.edge_by_id(1) is None
+
+
+def test_request_accept_delete_through_api(client):
+    a, b = create_user(), create_user()
+    friendship_id = befriend(client, a, b)
+    assert friend_ids(client, a) == [b.id]
+    assert friend_ids(client, b) == [a.id]
+    assert friend_graph.graph.edge_by_id(friendship_id).status == ACCEPTED
+
+    assert client.post(f"{API}/friends/request", json={"target_number": b.number}, headers=auth_headers(a)).status_code == 400
+    assert client.delete(f"{API}/friends/{b.id}", headers=auth_headers(a)).status_code == 200
+    assert friend_ids(client, a) == []
+    assert client.delete(f"{API}/friends/{b.id}", headers=auth_headers(a)).status_code == 404
+
+
+def test_picks_up_writes_from_other_workers(client, db, monkeypatch):
+    a, b = create_user(), create_user()
+    monkeypatch.setattr(settings, "FRIEND_GRAPH_REFRESH", 0)
+    # Written behind the graph's back, as another worker would
+    row = Friendship(user_id=a.id, friend_id=b.id, status=ACCEPTED, updated_at=datetime.utcnow())
+    db.add(row)
+    db.commit()
+    assert friend_ids(client, a) == [b.id]
+
+    db.delete(row)
+    db.commit()
+    assert friend_ids(client, a) == []
+
+
+def test_private_chat_does_not_require_friendship(client, user):
+    # The graph only answers lookups, it does not gate private chat
+    other = create_user()
+    with client.websocket_connect(f"{API}/chat/ws/{security.create_access_token(user.username)}") as ws:
+        ws.send_text(json.dumps({"type": "text", "content": "hi", "to_user_id": other.id}))
+        assert ws.receive_json()["to_user_id"] == other.id
+
+    history = client.get(f"{API}/chat/private/history?friend_id={user.id}", headers=auth_headers(other))
+    assert history.status_code == 200
+    assert [message["content"] for message in history.json()] == ["hi"]
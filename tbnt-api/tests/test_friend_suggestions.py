@@ -0,0 +1,59 @@
+import pytest
+
+from app.core.config import settings
+from app.services.friend_suggestions import SuggestionIndex
+from tests.conftest import API, auth_headers, befriend, create_user
+
+#   1 - 2 - 4
+#   |   |  /
+#   3 --+-5     6 (no friends)
+PAIRS = [(1, 2), (1, 3), (2, 4), (2, 5), (3, 5), (4, 5)]
+
+
+def test_index_mutual_friends():
+    index = SuggestionIndex(PAIRS)
+    assert len(index) == 5
+    assert index.mutual_friends(1, 5) == [2, 3]
+    assert index.mutual_friends(4, 5) == [2]
+    assert index.mutual_friends(1, 6) == []
+
+
+def test_index_suggestions_ranked_by_mutual_count():
+    index = SuggestionIndex(PAIRS)
+    # 5 shares 2 and 3 with 1; 4 only 2
+    assert index.suggest(1) == [(5, 2), (4, 1)]
+    # Ties keep the lower id, the limit applies after ranking
+    assert index.suggest(4, limit=1) == [(1, 1)]
+    assert index.suggest(6) == []
+    assert SuggestionIndex([]).suggest(1) == []
+
+
+@pytest.fixture
+def fresh_index(monkeypatch):
+    monkeypatch.setattr(settings, "SUGGESTIONS_REFRESH", 0)
+
+
+def test_suggestions_endpoint(client, fresh_index):
+    me, friend, candidate, requested = (create_user(phone="555-0100") for _ in range(4))
+    befriend(client, me, friend)
+    befriend(client, friend, candidate)
+    befriend(client, friend, requested)
+    # A pending request hides the person from suggestions
+    client.post(f"{API}/friends/request", json={"target_number": requested.number}, headers=auth_headers(me))
+
+    response = client.get(f"{API}/friends/suggestions", headers=auth_headers(me))
+    assert response.status_code == 200
+    body = response.json()
+    assert [item["user"]["id"] for item in body] == [candidate.id]
+    assert body[0]["mutual_count"] == 1
+    # Not a friend: public profile only
+    assert "phone" not in body[0]["user"] and "role_level" not in body[0]["user"]
+
+
+def test_mutual_friends_endpoint(client):
+    me, other, common = create_user(), create_user(), create_user()
+    befriend(client, me, common)
+    befriend(client, other, common)
+    body = client.get(f"{API}/friends/mutual/{other.id}", headers=auth_headers(me)).json()
+    assert body["mutual_count"] == 1
+    assert [user["id"] for user in body["mutual_friends"]] == [common.id]
@@ -0,0 +1,103 @@
+import os
+import time
+import uuid
+
+import pytest
+
+from app.core import images
+from app.core.config import settings
+from app.models.chat import ChatMessage
+from app.services import image_gc
+from tests.conftest import create_user
+
+OLD = time.time() - settings.IMAGE_GC_GRACE - 60
+
+
+def put(relative: str, mtime: float = OLD):
+    path = settings.IMAGE_DIR / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x")
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def upload(flat: bool = False, mtime: float = OLD):
+    """
+    An original with a compressed copy and two variants. Returns (name, paths).
+    """
+    filename = f"{uuid.uuid4()}.png"
+    name = filename if flat else images.sharded_name(filename)
+    paths = [put(name, mtime), put(f"{name}.gz", mtime)]
+    paths += [put(images.variant_name(name, variant), mtime) for variant in ("avatar", "preview")]
+    return name, paths
+
+
+def shard(name: str) -> str:
+    return name.split("/")[0] if "/" in name else image_gc.FLAT
+
+
+def test_orphans_are_deleted_with_their_copies(db):
+    name, paths = upload()
+    assert image_gc.collect_shard(db, shard(name)) >= 1
+    assert not any(path.exists() for path in paths)
+
+
+def test_referenced_originals_and_variants_are_kept(db, user):
+    in_chat, chat_paths = upload()
+    as_avatar, avatar_paths = upload()
+    # Referenced through a variant URL only
+    db.add(ChatMessage(user_id=user.id, content=images.image_url(images.variant_name(in_chat, "preview")),
+                       message_type="image", created_at="2024-05-01 10:00:00"))
+    db.commit()
+    create_user(avatar=images.image_url(as_avatar))
+
+    image_gc.collect_shard(db, shard(in_chat))
+    image_gc.collect_shard(db, shard(as_avatar))
+    assert all(path.exists() for path in chat_paths + avatar_paths)
+
+
+def test_young_files_are_kept(db):
+    name, paths = upload(mtime=time.time())
+    image_gc.collect_shard(db, shard(name))
+    assert all(path.exists() for path in paths)
+
+
+def test_variant_without_original_is_deleted(db):
+    name = images.sharded_name(f"{uuid.uuid4()}.png")
+    variant = put(images.variant_name(name, "avatar"))
+    image_gc.collect_shard(db, shard(name))
+    assert not variant.exists()
+
+
+def test_legacy_flat_layout_is_collected(db):
+    orphan, orphan_paths = upload(flat=True)
+    kept, kept_paths = upload(flat=True)
+    create_user(avatar=images.image_url(kept))
+    other = put("robots.txt")  # Not an upload name
+
+    image_gc.collect_shard(db, image_gc.FLAT)
+    assert not any(path.exists() for path in orphan_paths)
+    assert all(path.exists() for path in kept_paths)
+    assert other.exists()
+
+
+@pytest.fixture
+def visited(monkeypatch):
+    shards = []
+    monkeypatch.setattr(image_gc, "collect_shard", lambda db, shard: shards.append(shard) or 0)
+    image_gc._save_cursor(0)
+    return shards
+
+
+def test_steps_resume_where_the_last_one_stopped(visited):
+    all_shards = image_gc.all_shards()
+    assert image_gc.run_step(shards_per_run=3) == 0
+    assert image_gc.run_step(shards_per_run=3) == 0
+    assert visited == all_shards[:6]
+
+    # A full pass includes the flat layout, then wraps around
+    visited.clear()
+    image_gc._save_cursor(len(all_shards) - 1)
+    image_gc.run_step(shards_per_run=2)
+    assert visited == [image_gc.FLAT, all_shards[0]]
+    assert image_gc._load_cursor() == 1
@@ -0,0 +1,52 @@
+import io
+import uuid
+
+from PIL import Image
+
+from app.core import images
+from app.core.config import settings
+
+
+def store(data: bytes, ext: str = ".png") -> str:
+    name = images.sharded_name(f"{uuid.uuid4()}{ext}")
+    path = settings.IMAGE_DIR / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return name
+
+
+def png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (200, 100), "red").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_variant_rendered_on_first_request(client):
+    name = store(png())
+    response = client.get(images.image_url(images.variant_name(name, "avatar")))
+    assert response.status_code == 200
+    with Image.open(io.BytesIO(response.content)) as img:
+        assert img.format == "WEBP" and max(img.size) == 64
+
+
+def test_failed_render_is_not_retried(client, monkeypatch):
+    name = store(b"not an image")
+    url = images.image_url(images.variant_name(name, "preview"))
+    assert client.get(url).status_code == 404
+
+    submitted = []
+    real_executor = images._get_executor
+    monkeypatch.setattr(images, "_get_executor", lambda: submitted.append(1) or real_executor())
+    assert client.get(url).status_code == 404
+    assert submitted == []
+
+    # Retried once the negative entry expires
+    key = str(settings.IMAGE_DIR.resolve() / images.variant_name(name, "preview"))
+    images._failed[key] = 0
+    assert client.get(url).status_code == 404
+    assert submitted == [1]
+
+
+def test_missing_source_has_no_variant(client):
+    url = images.image_url(images.variant_name(images.sharded_name(f"{uuid.uuid4()}.png"), "avatar"))
+    assert client.get(url).status_code == 404
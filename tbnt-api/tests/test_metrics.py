@@ -0,0 +1,19 @@
+from tests.conftest import API, auth_headers
+
+
+def test_admission_metrics(client, user, admin):
+    assert client.get(f"{API}/admin/metrics/admission", headers=auth_headers(user)).status_code == 403
+
+    client.get(f"{API}/work/items", headers=auth_headers(user))
+    response = client.get(f"{API}/admin/metrics/admission", headers=auth_headers(admin))
+    assert response.status_code == 200
+    body = response.json()
+    assert body["threadpool"]["size"] > 0
+    assert body["classes"]["default"]["admitted"] >= 1
+    assert body["classes"]["critical"]["active"] == 1  # This request
+
+
+def test_websocket_metrics(client, admin):
+    response = client.get(f"{API}/admin/metrics/websockets", headers=auth_headers(admin))
+    assert response.status_code == 200
+    assert {"connections", "reaped", "read_receipts"} <= response.json().keys()
@@ -0,0 +1,47 @@
+import json
+import threading
+
+from app.core import profiling
+from app.core.config import settings
+from tests.conftest import API, auth_headers
+
+
+def test_token_profile_is_written_off_the_event_loop(client, user, monkeypatch):
+    writers = []
+    save = profiling.save
+
+    def recording_save(*args, **kwargs):
+        writers.append(threading.current_thread().name)
+        return save(*args, **kwargs)
+
+    monkeypatch.setattr(profiling, "save", recording_save)
+    monkeypatch.setattr(settings, "PROFILE_INTERVAL", 0.0005)
+    before = set(settings.PROFILE_DIR.glob("*.json")) if settings.PROFILE_DIR.is_dir() else set()
+
+    headers = {**auth_headers(user), "X-Profile": profiling.make_token()}
+    assert client.get(f"{API}/work/items/page?limit=200", headers=headers).status_code == 200
+
+    assert writers == ["AnyIO worker thread"]
+    written = set(settings.PROFILE_DIR.glob("*.json")) - before
+    if written:  # A very fast request may have no samples at all
+        data = json.loads(written.pop().read_text())
+        assert data["route"] == f"{API}/work/items/page"
+        assert data["scope"] == "process"
+        assert data["concurrent"] == 1
+        assert all(";" in stack for stack in data["samples"])
+
+
+def test_unsampled_requests_leave_no_profile(client, user):
+    before = set(settings.PROFILE_DIR.glob("*.json")) if settings.PROFILE_DIR.is_dir() else set()
+    client.get(f"{API}/work/items", headers={**auth_headers(user), "X-Profile": "1.forged"})
+    after = set(settings.PROFILE_DIR.glob("*.json")) if settings.PROFILE_DIR.is_dir() else set()
+    assert after == before
+    assert profiling._in_flight == 0
+
+
+def test_thread_labels():
+    assert profiling.thread_label("asyncio_3") == "asyncio"
+    assert profiling.thread_label("Thread-7 (worker)") == "Thread"
+    assert profiling.thread_label("asyncio-portal-7f3d364681d") == "asyncio-portal"
+    assert profiling.thread_label("MainThread") == "MainThread"
+    assert profiling.thread_label("AnyIO worker thread") == "AnyIO worker thread"
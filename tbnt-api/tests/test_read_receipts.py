@@ -0,0 +1,75 @@
+import asyncio
+import json
+
+from app.core.config import settings
+from app.models.chat import ChatMessage
+from app.services.connections import manager
+from app.services.read_receipts import ReadReceipts
+from tests.conftest import RecordingSocket, create_user
+
+
+def private_messages(db, sender, receiver, count):
+    messages = [
+        ChatMessage(user_id=sender.id, to_user_id=receiver.id, content=str(i), created_at="2024-05-01 10:00:00")
+        for i in range(count)
+    ]
+    db.add_all(messages)
+    db.commit()
+    return [message.id for message in messages]
+
+
+def test_reports_are_coalesced_into_one_write(db, monkeypatch):
+    monkeypatch.setattr(settings, "READ_RECEIPT_DELAY", 0.01)
+    reader, friend = create_user(), create_user()
+    ids = private_messages(db, friend, reader, 3)
+
+    async def scenario():
+        receipts = ReadReceipts()
+        friend_socket = RecordingSocket()
+        await manager.connect(friend_socket, friend.id)
+        try:
+            receipts.mark(reader.id, friend.id, ids[0])
+            receipts.mark(reader.id, friend.id, ids[1])
+            receipts.mark(reader.id, friend.id, ids[0])  # Older report, ignored
+            assert receipts.metrics()["pending"] == 1
+            await receipts._flush
+        finally:
+            manager.disconnect(friend_socket)
+            await manager.stop()
+        return receipts, friend_socket
+
+    receipts, friend_socket = asyncio.run(scenario())
+    assert receipts.metrics() == {"reports": 3, "batches": 1, "conversations": 1, "pending": 0}
+
+    db.expire_all()
+    read = [message.is_read for message in db.query(ChatMessage).filter(ChatMessage.id.in_(ids)).order_by(ChatMessage.id)]
+    assert read == [True, True, False]
+    # The sender learns how far their messages were read
+    assert [json.loads(frame) for frame in friend_socket.frames] == [
+        {"type": "read", "user_id": reader.id, "message_id": ids[1]}
+    ]
+
+
+def test_nothing_to_mark_sends_no_receipt(db):
+    reader, friend = create_user(), create_user()
+    ids = private_messages(db, friend, reader, 1)
+
+    async def scenario():
+        receipts = ReadReceipts()
+        friend_socket = RecordingSocket()
+        await manager.connect(friend_socket, friend.id)
+        try:
+            receipts.mark(reader.id, friend.id, ids[0])
+            await receipts.flush()
+            # Already read: the second batch changes nothing
+            receipts.mark(reader.id, friend.id, ids[0])
+            await receipts.flush()
+            receipts._flush.cancel()
+        finally:
+            manager.disconnect(friend_socket)
+            await manager.stop()
+        return receipts, friend_socket
+
+    receipts, friend_socket = asyncio.run(scenario())
+    assert receipts.batches == 2
+    assert len(friend_socket.frames) == 1
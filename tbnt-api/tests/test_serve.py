@@ -0,0 +1,61 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from app.commands import serve
+from app.core.config import settings
+
+
+def test_single_worker_with_chat_websocket(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_WEBSOCKET", True)
+    assert serve.worker_count(4) == 1
+    assert serve.worker_count(0) == 1
+
+
+def test_workers_without_chat_websocket(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_WEBSOCKET", False)
+    monkeypatch.setattr(serve.os, "cpu_count", lambda: 8)
+    assert serve.worker_count(4) == 4
+    assert serve.worker_count(0) == 8
+
+
+def test_sighup_reloads_single_worker(tmp_path):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    env = dict(
+        os.environ, SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path}/serve.db", IMAGE_DIR=f"{tmp_path}/image",
+        PROFILE_DIR=f"{tmp_path}/profiles", IMAGE_GC_INTERVAL="0", CHAT_WEBSOCKET="1",
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "app.commands.serve", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", "1", "--log-level", "warning"],
+        env=env,
+    )
+
+    def get() -> int:
+        return urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=2).status
+
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                assert get() == 200
+                break
+            except OSError:
+                assert proc.poll() is None and time.monotonic() < deadline
+                time.sleep(0.05)
+
+        proc.send_signal(signal.SIGHUP)
+        # Served throughout the reload
+        for _ in range(30):
+            assert get() == 200
+            time.sleep(0.05)
+        assert proc.poll() is None
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        assert proc.wait(timeout=60) == 0
@@ -0,0 +1,73 @@
+import gzip
+import uuid
+
+import pytest
+
+from app.core import images
+from app.core.config import settings
+from app.core.static import accepted_encodings
+
+BODY = b"body { color: red; }\n" * 50
+
+
+@pytest.fixture
+def upload():
+    """
+    A content-addressed file with a pre-compressed copy. Returns its URL.
+    """
+    name = images.sharded_name(f"{uuid.uuid4()}.css")
+    path = settings.IMAGE_DIR / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(BODY)
+    (settings.IMAGE_DIR / f"{name}.gz").write_bytes(gzip.compress(BODY))
+    return images.image_url(name)
+
+
+def test_accepted_encodings_parses_q_values():
+    assert accepted_encodings("gzip, br;q=0.5, deflate;q=0") == {"gzip": 1.0, "br": 0.5, "deflate": 0.0}
+    assert accepted_encodings("") == {}
+
+
+def test_immutable_file_is_cached_forever(client, upload):
+    response = client.get(upload, headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.content == BODY
+    assert "immutable" in response.headers["cache-control"]
+    etag = response.headers["etag"]
+
+    again = client.get(upload, headers={"Accept-Encoding": "identity", "If-None-Match": etag})
+    assert again.status_code == 304
+
+
+def test_mutable_name_must_revalidate(client):
+    path = settings.IMAGE_DIR / "logo.txt"
+    path.write_bytes(b"logo")
+    response = client.get("/static/logo.txt")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-cache"
+
+
+def test_precompressed_copy_when_accepted(client, upload):
+    response = client.get(upload, headers={"Accept-Encoding": "br;q=0, gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-type"].startswith("text/css")
+    assert response.content == BODY  # Decoded by the client
+    assert response.headers["etag"].endswith('-gzip"')
+
+
+def test_no_precompressed_copy_with_q_zero(client, upload):
+    for accept in ("gzip;q=0", "*;q=0", "identity"):
+        response = client.get(upload, headers={"Accept-Encoding": accept})
+        assert "content-encoding" not in response.headers, accept
+        assert response.content == BODY
+
+
+def test_range_is_served_from_identity_file(client, upload):
+    response = client.get(upload, headers={"Accept-Encoding": "gzip", "Range": "bytes=0-9"})
+    assert response.status_code == 206
+    assert "content-encoding" not in response.headers
+    assert response.content == BODY[:10]
+
+
+def test_missing_file_is_404(client):
+    assert client.get(f"/static/{uuid.uuid4()}.css", headers={"Accept-Encoding": "gzip"}).status_code == 404
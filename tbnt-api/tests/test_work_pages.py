@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.db.repository import engine
+from app.models.work import WorkItem, WorkRecord
+from tests.conftest import API, auth_headers
+
+
+@pytest.fixture
+def items(db, user):
+    """
+    25 items of alternating types; every 5 share a created_at to exercise
+    the id tie-break of the cursor.
+    """
+    start = datetime(2024, 1, 1, 9)
+    for i in range(25):
+        db.add(WorkItem(
+            user_id=user.id, type="memo" if i % 2 else "plan", content=str(i),
+            created_at=start + timedelta(minutes=i // 5),
+        ))
+    db.commit()
+    return user
+
+
+def pages(client, headers, query=""):
+    ids, cursor = [], None
+    while True:
+        url = f"{API}/work/items/page?limit=4{query}" + (f"&cursor={cursor}" if cursor else "")
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        body = response.json()
+        ids += [item["id"] for item in body["items"]]
+        cursor = body["next_cursor"]
+        if not cursor:
+            return ids
+
+
+@pytest.fixture
+def plans():
+    """
+    Query plans of the work_items page queries run while the test is active.
+    """
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith("SELECT") and "FROM work_items" in statement and "LIMIT" in statement:
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    yield statements
+    event.remove(engine, "before_cursor_execute", capture)
+
+
+def explain(statements):
+    with engine.connect() as conn:
+        return [
+            " ".join(row[3] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters))
+            for statement, parameters in statements
+        ]
+
+
+@pytest.mark.parametrize("query, index", [
+    ("", "ix_work_items_user_created"),
+    ("&type=memo", "ix_work_items_user_type_created"),
+])
+def test_keyset_pages(client, db, items, plans, query, index):
+    ids = pages(client, auth_headers(items), query)
+
+    expected = db.query(WorkItem.id).filter(WorkItem.user_id == items.id)
+    if query:
+        expected = expected.filter(WorkItem.type == "memo")
+    expected = [row.id for row in expected.order_by(WorkItem.created_at.desc(), WorkItem.id.desc())]
+    assert ids == expected
+
+    # Every page is an index range read, never a sort of the user's items
+    for plan in explain(plans):
+        assert index in plan
+        assert "TEMP B-TREE" not in plan
+
+
+def test_invalid_cursor(client, user):
+    response = client.get(f"{API}/work/items/page?cursor=nonsense", headers=auth_headers(user))
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("query, index", [
+    ("", "ix_work_items_user_created"),
+    ("&type=memo", "ix_work_items_user_type_created"),
+])
+def test_keyset_pages_with_null_created_at(client, db, items, plans, query, index):
+    # Legacy rows without created_at come after all dated rows
+    for i in range(6):
+        db.add(WorkItem(user_id=items.id, type="memo", content=f"old {i}"))
+    db.commit()
+    db.query(WorkItem).filter(WorkItem.content.like("old %")).update({"created_at": None}, synchronize_session=False)
+    db.commit()
+
+    ids = pages(client, auth_headers(items), query)
+
+    expected = db.query(WorkItem.id, WorkItem.created_at).filter(WorkItem.user_id == items.id)
+    if query:
+        expected = expected.filter(WorkItem.type == "memo")
+    expected = expected.order_by(WorkItem.created_at.desc(), WorkItem.id.desc()).all()
+    assert expected[-1].created_at is None
+    assert ids == [row.id for row in expected]
+
+    for plan in explain(plans):
+        assert index in plan
+        assert "TEMP B-TREE" not in plan
+
+
+def test_record_pages_with_null_date(client, db, user):
+    days = ["2024-01-03", "2024-01-02", "2024-01-02", None, None, "2024-01-01", None]
+    for day in days:
+        db.add(WorkRecord(user_id=user.id, date=day))
+    db.commit()
+
+    ids, cursor = [], None
+    while True:
+        url = f"{API}/work/records/page?limit=2" + (f"&cursor={cursor}" if cursor else "")
+        body = client.get(url, headers=auth_headers(user)).json()
+        ids += [item["id"] for item in body["items"]]
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+
+    expected = db.query(WorkRecord.id).filter(WorkRecord.user_id == user.id).order_by(
+        WorkRecord.date.desc(), WorkRecord.id.desc()
+    )
+    assert ids == [row.id for row in expected]
+    assert len(ids) == len(days)
@@ -0,0 +1,49 @@
+import pytest
+
+from app.models.work import WorkDay, WorkRecord
+from app.services import work_stats
+from tests.conftest import API, auth_headers
+
+
+@pytest.fixture
+def two_records(db, user):
+    """
+    Two records on the same day: 8 hours, then 1 hour an evening later.
+    """
+    first = WorkRecord(user_id=user.id, date="2024-03-04",
+                       clock_in_time="2024-03-04 09:00:00", clock_out_time="2024-03-04 17:00:00")
+    second = WorkRecord(user_id=user.id, date="2024-03-04",
+                        clock_in_time="2024-03-04 19:00:00", clock_out_time="2024-03-04 20:00:00")
+    db.add_all([first, second])
+    db.commit()
+    return first, second
+
+
+def rollup(db, user_id):
+    db.expire_all()
+    return [(row.date.isoformat(), row.record_id, row.seconds, row.overtime_seconds)
+            for row in db.query(WorkDay).filter(WorkDay.user_id == user_id)]
+
+
+@pytest.mark.parametrize("order", [(0, 1), (1, 0)])
+def test_live_and_backfill_keep_the_same_record(db, user, two_records, order):
+    first, _ = two_records
+    # One clock-out per request, each in its own transaction
+    for i in order:
+        work_stats.record_day(db, two_records[i], "18:00")
+        db.commit()
+    live = rollup(db, user.id)
+    assert live == [("2024-03-04", first.id, 8 * 3600, 0)]
+
+    assert work_stats.backfill(db, user_id=user.id) == 1
+    assert rollup(db, user.id) == live
+
+
+def test_clock_out_updates_the_rollup(client, db, user):
+    headers = auth_headers(user)
+    assert client.post(f"{API}/work/clock-out", headers=headers).status_code == 200
+    record = db.query(WorkRecord).filter(WorkRecord.user_id == user.id).one()
+    assert [row[1] for row in rollup(db, user.id)] == [record.id]
+
+    stats = client.get(f"{API}/work/stats?period=day", headers=headers)
+    assert stats.status_code == 200
@@ -0,0 +1,55 @@
+from sqlalchemy import create_engine, text
+
+from app.db.migrations import upgrade_schema
+from tests.conftest import API, auth_headers
+
+
+def batch(client, headers, *operations):
+    return client.post(f"{API}/work/items/batch", json={"operations": list(operations)}, headers=headers)
+
+
+def test_delete_then_create_does_not_reuse_id(client, user):
+    headers = auth_headers(user)
+    created = batch(client, headers, {"op": "create", "type": "memo", "content": "a"})
+    assert created.status_code == 200
+    since = created.json()["version"]
+    item_id = created.json()["results"][0]["id"]
+
+    assert batch(client, headers, {"op": "delete", "id": item_id}).status_code == 200
+    again = batch(client, headers, {"op": "create", "type": "memo", "content": "b"})
+    new_id = again.json()["results"][0]["id"]
+    assert new_id != item_id
+
+    delta = client.get(f"{API}/work/items/changes?since={since}", headers=headers).json()
+    assert delta["full"] is False
+    assert [item["id"] for item in delta["items"]] == [new_id]
+    assert delta["deleted"] == [item_id]
+
+
+def test_update_or_delete_without_id_is_rejected(client, user):
+    headers = auth_headers(user)
+    for op in ("update", "delete"):
+        response = batch(client, headers, {"op": op, "content": "x"})
+        assert response.status_code == 422
+
+
+def test_migration_adds_autoincrement_above_deleted_ids(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/old.db")
+    with engine.begin() as conn:
+        # work_items as created before AUTOINCREMENT, item 3 already deleted
+        conn.execute(text("CREATE TABLE work_items (id INTEGER PRIMARY KEY, user_id INTEGER, type VARCHAR, content VARCHAR)"))
+        conn.execute(text("INSERT INTO work_items (id, user_id, type, content) VALUES (1, 1, 'memo', 'kept'), (2, 1, 'memo', 'kept')"))
+        conn.execute(text("CREATE TABLE work_item_tombstones (id INTEGER PRIMARY KEY, user_id INTEGER, item_id INTEGER, version INTEGER)"))
+        conn.execute(text("INSERT INTO work_item_tombstones (user_id, item_id, version) VALUES (1, 3, 1)"))
+
+    upgrade_schema(engine)
+    upgrade_schema(engine)  # Idempotent
+
+    with engine.begin() as conn:
+        sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'work_items'")).scalar()
+        assert "AUTOINCREMENT" in sql
+        assert conn.execute(text("SELECT COUNT(*) FROM work_items")).scalar() == 2
+        conn.execute(text("INSERT INTO work_items (user_id, type, content) VALUES (1, 'memo', 'new')"))
+        assert conn.execute(text("SELECT MAX(id) FROM work_items")).scalar() == 4
+        indexes = {row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'work_items'"))}
+        assert "ix_work_items_user_version" in indexes
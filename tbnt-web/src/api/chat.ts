@@ -1,10 +1,18 @@
 import request from '@/utils/request'
 import type { ChatMessage } from '@/stores/chat'
 
+export interface ChatRoom {
+  id: number
+  name: string
+  description?: string | null
+  created_by?: number | null
+  created_at?: string | null
+}
+
 export const uploadImage = (file: File) => {
   const formData = new FormData()
   formData.append('file', file)
-  return request.post<{ url: string }>('/chat/upload', formData, {
+  return request.post<{ url: string; variants?: Record<string, string> }>('/chat/upload', formData, {
     headers: {
       'Content-Type': 'multipart/form-data'
     }
@@ -15,6 +23,20 @@ export const getLobbyHistory = (skip: number = 0, limit: number = 50) => {
   return request.get<ChatMessage[]>(`/chat/history?skip=${skip}&limit=${limit}`)
 }
 
+export const getRooms = () => {
+  return request.get<ChatRoom[]>('/chat/rooms')
+}
+
+export const createRoom = (name: string, description?: string) => {
+  return request.post<ChatRoom>('/chat/rooms', { name, description })
+}
+
+// Pass the oldest loaded message id as beforeId to load older messages
+export const getRoomHistory = (roomId: number, limit: number = 50, beforeId?: number) => {
+  const before = beforeId ? `&before_id=${beforeId}` : ''
+  return request.get<ChatMessage[]>(`/chat/rooms/${roomId}/history?limit=${limit}${before}`)
+}
+
 export const getPrivateHistory = (friendId: number, skip: number = 0, limit: number = 50) => {
   return request.get<ChatMessage[]>(`/chat/private/history?friend_id=${friendId}&skip=${skip}&limit=${limit}`)
 }
@@ -26,12 +26,29 @@ export interface Friend {
   created_at: string
   friend_info: UserInfo
   unread_count?: number
+  last_message?: {
+    id: number
+    user_id: number
+    content: string
+    message_type: string
+    created_at: string
+  } | null
+}
+
+export interface ConversationPage {
+  items: Friend[]
+  next_cursor: string | null
 }
 
 export const getFriends = () => {
   return request.get<Friend[]>('/friends/')
 }
 
+// Friends with unread counts and last message, most recent first
+export const getConversations = (cursor?: string, limit: number = 50) => {
+  return request.get<ConversationPage>('/chat/conversations', { params: { cursor, limit } })
+}
+
 export const getFriendRequests = () => {
   return request.get<FriendRequest[]>('/friends/requests')
 }
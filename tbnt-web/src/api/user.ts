@@ -12,7 +12,6 @@ export interface RegisterParams {
   nickname?: string
   avatar?: string
   phone?: string
-  role_level?: number
 }
 
 interface LoginResponse {
@@ -53,7 +52,7 @@ export const updatePassword = (data: { old_password: string; new_password: strin
 export const uploadAvatar = (file: File) => {
   const formData = new FormData()
   formData.append('file', file)
-  return request.post<{ url: string }>('/auth/upload-avatar', formData, {
+  return request.post<{ url: string; variants?: Record<string, string> }>('/auth/upload-avatar', formData, {
     headers: {
       'Content-Type': 'multipart/form-data'
     }
@@ -49,6 +49,24 @@ export const getWorkItems = (type?: string) => {
   return request.get<WorkItem[]>('/work/items', { params: { type } })
 }
 
+export interface WorkItemQuery {
+  type?: 'memo' | 'plan' | 'progress'
+  status?: 'pending' | 'done'
+  start?: string // YYYY-MM-DD, inclusive
+  end?: string
+  cursor?: string
+  limit?: number
+}
+
+export interface WorkItemPage {
+  items: WorkItem[]
+  next_cursor: string | null
+}
+
+export const getWorkItemsPage = (params?: WorkItemQuery) => {
+  return request.get<WorkItemPage>('/work/items/page', { params })
+}
+
 export const createWorkItem = (data: WorkItemCreate) => {
   return request.post<WorkItem>('/work/items', data)
 }
@@ -61,6 +79,37 @@ export const deleteWorkItem = (id: number) => {
   return request.delete<WorkItem>(`/work/items/${id}`)
 }
 
+// Batch and delta sync
+export interface WorkItemOperation {
+  op: 'create' | 'update' | 'delete'
+  id?: number
+  client_id?: string
+  type?: 'memo' | 'plan' | 'progress'
+  content?: string
+  status?: 'pending' | 'done'
+  percentage?: number
+}
+
+export interface WorkItemBatchResult {
+  version: number
+  results: { op: string; id: number; client_id?: string; item: WorkItem | null }[]
+}
+
+export interface WorkItemChanges {
+  version: number
+  full: boolean
+  items: WorkItem[]
+  deleted: number[]
+}
+
+export const batchWorkItems = (operations: WorkItemOperation[]) => {
+  return request.post<WorkItemBatchResult>('/work/items/batch', { operations })
+}
+
+export const getWorkItemChanges = (since: number) => {
+  return request.get<WorkItemChanges>('/work/items/changes', { params: { since } })
+}
+
 export interface WorkRecord {
   id: number
   user_id: number
@@ -77,6 +126,45 @@ export const getWorkRecords = () => {
   return request.get<WorkRecord[]>('/work/records')
 }
 
+export interface WorkRecordQuery {
+  start?: string // YYYY-MM-DD, inclusive
+  end?: string
+  cursor?: string
+  limit?: number
+}
+
+export interface WorkRecordPage {
+  items: WorkRecord[]
+  next_cursor: string | null
+}
+
+export const getWorkRecordsPage = (params?: WorkRecordQuery) => {
+  return request.get<WorkRecordPage>('/work/records/page', { params })
+}
+
 export const getTodayWorkRecord = () => {
   return request.get<WorkRecord>('/work/records/today')
 }
+
+export interface WorkStatsPeriod {
+  start: string
+  days: number
+  seconds: number
+  overtime_seconds: number
+}
+
+export interface WorkStats {
+  period: 'day' | 'week' | 'month'
+  start: string
+  end: string
+  days: number
+  seconds: number
+  overtime_seconds: number
+  current_streak: number
+  longest_streak: number
+  periods: WorkStatsPeriod[]
+}
+
+export const getWorkStats = (params?: { period?: 'day' | 'week' | 'month'; start?: string; end?: string }) => {
+  return request.get<WorkStats>('/work/stats', { params })
+}
@@ -12,6 +12,7 @@ export interface ChatMessage {
   created_at: string
   is_read?: boolean
   to_user_id?: number | null
+  room_id?: number | null
   sender?: {
     id: number
     username: string
@@ -27,10 +28,15 @@ export const useChatStore = defineStore('chat', () => {
   const ws = ref<WebSocket | null>(null)
   const isConnected = ref(false)
   const reconnectTimer = ref<number | null>(null)
+  // Sender profiles announced by the server on this connection
+  const senders = new Map<number, ChatMessage['sender']>()
 
   // Messages
   const lobbyMessages = ref<ChatMessage[]>([])
   const privateMessages = ref<Record<number, ChatMessage[]>>({})
+  const roomMessages = ref<Record<number, ChatMessage[]>>({})
+  // Rooms to (re)subscribe to on every connect; the lobby is subscribed by default
+  const subscribedRooms = ref<Set<number>>(new Set())
 
   // Unread Counts
   const unreadCounts = ref<Record<number, number>>({})
@@ -55,10 +61,14 @@ export const useChatStore = defineStore('chat', () => {
     const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:'
     const wsUrl = `${protocol}//localhost:8000/api/v1/chat/ws/${authStore.token}`
 
+    // Plain JSON frames. The compact subprotocol (tbnt.compact.v1, handled
+    // below through `user` frames) saves nothing once permessage-deflate is
+    // on and costs the server slightly more per broadcast, so it is not offered
     ws.value = new WebSocket(wsUrl)
 
     ws.value.onopen = () => {
       isConnected.value = true
+      senders.clear()
       console.log('Connected to chat server')
       // Clear reconnect timer if successful
       if (reconnectTimer.value) {
@@ -67,28 +77,57 @@ export const useChatStore = defineStore('chat', () => {
       }
       // Fetch unread counts
       fetchUnreadCounts()
+      subscribedRooms.value.forEach(roomId => {
+        ws.value?.send(JSON.stringify({ type: 'subscribe', room_id: roomId }))
+      })
     }
 
     ws.value.onmessage = (event) => {
       try {
-        const message: ChatMessage = JSON.parse(event.data)
+        const data = JSON.parse(event.data)
+        // Control frames carry a `type`; chat messages use `message_type`
+        if (data.type === 'error') {
+          ElMessage.warning(data.detail)
+          return
+        }
+        // Server heartbeat: answer so the connection is not reaped
+        if (data.type === 'ping') {
+          ws.value?.send(JSON.stringify({ type: 'pong' }))
+          return
+        }
+        if (data.type === 'pong' || data.type === 'subscribed' || data.type === 'unsubscribed') return
+        // Read receipt: the friend has read my messages up to message_id
+        if (data.type === 'read') {
+          privateMessages.value[data.user_id]?.forEach(m => {
+            if (m.user_id === authStore.user?.id && m.id <= data.message_id) m.is_read = true
+          })
+          return
+        }
+        if (data.type === 'user') {
+          senders.set(data.user.id, data.user)
+          return
+        }
+        const message: ChatMessage = data
+        if (!message.sender) message.sender = senders.get(message.user_id)
         handleIncomingMessage(message)
       } catch (e) {
         console.error('Failed to parse message', e)
       }
     }
 
-    ws.value.onclose = () => {
+    ws.value.onclose = (event) => {
       isConnected.value = false
       console.log('Disconnected from chat server')
 
-      // Reconnect logic
+      // Reconnect logic. 1012 = server worker restarting: another worker is
+      // already serving, come back quickly but spread out
+      const delay = event.code === 1012 ? 250 + Math.random() * 1000 : 3000
       if (!reconnectTimer.value) {
         reconnectTimer.value = window.setTimeout(() => {
           console.log('Attempting to reconnect...')
           reconnectTimer.value = null
           connect()
-        }, 3000)
+        }, delay)
       }
     }
 
@@ -143,10 +182,19 @@ export const useChatStore = defineStore('chat', () => {
             if (activeChatId.value !== otherId) {
               const currentCount = unreadCounts.value[otherId] || 0
               unreadCounts.value[otherId] = currentCount + 1
+            } else {
+              sendRead(otherId, message.id)
             }
         }
     }
-    // 2. Lobby Message
+    // 2. Room Message
+    else if (message.room_id) {
+        const roomList = roomMessages.value[message.room_id] || (roomMessages.value[message.room_id] = [])
+        if (!roomList.some(m => m.id === message.id)) {
+            roomList.push(message)
+        }
+    }
+    // 3. Lobby Message
     else {
         if (!lobbyMessages.value.some(m => m.id === message.id)) {
             lobbyMessages.value.push(message)
@@ -154,7 +202,21 @@ export const useChatStore = defineStore('chat', () => {
     }
   }
 
-  const sendMessage = (content: string, type: string = 'text', toUserId?: number) => {
+  const subscribeRoom = (roomId: number) => {
+    subscribedRooms.value.add(roomId)
+    if (ws.value && ws.value.readyState === WebSocket.OPEN) {
+      ws.value.send(JSON.stringify({ type: 'subscribe', room_id: roomId }))
+    }
+  }
+
+  const unsubscribeRoom = (roomId: number) => {
+    subscribedRooms.value.delete(roomId)
+    if (ws.value && ws.value.readyState === WebSocket.OPEN) {
+      ws.value.send(JSON.stringify({ type: 'unsubscribe', room_id: roomId }))
+    }
+  }
+
+  const sendMessage = (content: string, type: string = 'text', toUserId?: number, roomId?: number) => {
     if (!ws.value || ws.value.readyState !== WebSocket.OPEN) {
         ElMessage.warning('聊天服务未连接')
         return
@@ -163,17 +225,34 @@ export const useChatStore = defineStore('chat', () => {
     const payload = {
       content,
       type,
-      to_user_id: toUserId
+      to_user_id: toUserId,
+      room_id: roomId
     }
 
     ws.value.send(JSON.stringify(payload))
   }
 
+  const newestMessageId = (friendId: number) => {
+    return Math.max(0, ...(privateMessages.value[friendId] || []).map(m => m.id))
+  }
+
+  // Report the newest message read in a conversation; the server batches these
+  const sendRead = (friendId: number, messageId: number) => {
+    if (!ws.value || ws.value.readyState !== WebSocket.OPEN) return
+    ws.value.send(JSON.stringify({ type: 'read', friend_id: friendId, message_id: messageId }))
+  }
+
   const markAsRead = async (friendId: number) => {
       if (unreadCounts.value[friendId]) {
           unreadCounts.value[friendId] = 0
       }
-      // Notify backend
+      // Notify backend: over the socket when connected (a conversation whose
+      // history is not loaded yet is reported by setPrivateHistory), else REST
+      if (ws.value && ws.value.readyState === WebSocket.OPEN) {
+        const newestId = newestMessageId(friendId)
+        if (newestId) sendRead(friendId, newestId)
+        return
+      }
       try {
         await markMessagesAsRead(friendId)
       } catch (error) {
@@ -183,12 +262,24 @@ export const useChatStore = defineStore('chat', () => {
 
   const setPrivateHistory = (friendId: number, messages: ChatMessage[]) => {
       privateMessages.value[friendId] = messages
+      const newestId = newestMessageId(friendId)
+      if (activeChatId.value === friendId && newestId) {
+          sendRead(friendId, newestId)
+      }
   }
 
   const setLobbyHistory = (messages: ChatMessage[]) => {
       lobbyMessages.value = messages
   }
 
+  const setRoomHistory = (roomId: number, messages: ChatMessage[]) => {
+      roomMessages.value[roomId] = messages
+  }
+
+  const prependRoomHistory = (roomId: number, messages: ChatMessage[]) => {
+      roomMessages.value[roomId] = [...messages, ...(roomMessages.value[roomId] || [])]
+  }
+
   const prependLobbyHistory = (messages: ChatMessage[]) => {
       lobbyMessages.value = [...messages, ...lobbyMessages.value]
   }
@@ -214,6 +305,8 @@ export const useChatStore = defineStore('chat', () => {
   const resetState = () => {
     lobbyMessages.value = []
     privateMessages.value = {}
+    roomMessages.value = {}
+    subscribedRooms.value = new Set()
     unreadCounts.value = {}
     activeChatId.value = null
     disconnect()
@@ -231,18 +324,24 @@ export const useChatStore = defineStore('chat', () => {
     isConnected,
     lobbyMessages,
     privateMessages,
+    roomMessages,
+    subscribedRooms,
     unreadCounts,
     totalUnreadCount,
     activeChatId,
     connect,
     disconnect,
     sendMessage,
+    subscribeRoom,
+    unsubscribeRoom,
     markAsRead,
     setActiveChat,
     setUnreadCounts,
     setPrivateHistory,
     setLobbyHistory,
     prependLobbyHistory,
+    setRoomHistory,
+    prependRoomHistory,
     prependPrivateHistory,
     fetchUnreadCounts,
     resetState
@@ -3,7 +3,7 @@ import { ref } from 'vue'
 import { useAuthStore } from './auth'
 import { useChatStore } from './chat'
 import {
-  getFriends,
+  getConversations,
   getFriendRequests,
   sendFriendRequest,
   respondFriendRequest,
@@ -23,7 +23,13 @@ export const useFriendStore = defineStore('friend', () => {
   const fetchFriends = async () => {
     if (!authStore.token) return
     try {
-      const data = await getFriends()
+      const data: Friend[] = []
+      let cursor: string | undefined
+      do {
+        const page = await getConversations(cursor)
+        data.push(...page.items)
+        cursor = page.next_cursor ?? undefined
+      } while (cursor)
       friends.value = data
 
       // Sync unread counts (only if provided by backend)
@@ -1,6 +1,12 @@
-export const getImageUrl = (path: string | null | undefined) => {
+// Resized variants rendered by the backend (see app/core/images.py)
+export type ImageVariant = 'avatar' | 'preview' | 'webp'
+
+export const getImageUrl = (path: string | null | undefined, variant?: ImageVariant) => {
   if (!path) return ''
   if (path.startsWith('http')) return path
+  if (variant && path.startsWith('/static/') && !path.startsWith('/static/variants/')) {
+    path = `/static/variants/${variant}/${path.slice('/static/'.length)}.webp`
+  }
   const baseUrl = import.meta.env.VITE_API_ORIGIN || 'http://localhost:8000'
   return `${baseUrl}${path}`
 }
@@ -67,6 +67,9 @@ class Request {
             case 500:
               message = detail || 'Internal server error'
               break
+            case 503:
+              message = detail || 'Server is busy, please retry'
+              break
             default:
               message = detail || `Error: ${error.response.status}`
           }